@@ -2,8 +2,23 @@
 
 from __future__ import annotations
 
+from typing import TYPE_CHECKING, Any
+
 
 __all__ = ["SpackPyPkg", "convert_package"]
 __version__ = "0.0.1"
 
-from .core import SpackPyPkg, convert_package
+if TYPE_CHECKING:
+    from .core import SpackPyPkg, convert_package
+
+
+def __getattr__(name: str) -> Any:
+    # core pulls in Spack, which is slow to import, so it is only loaded on first
+    # access (e.g. not for `py2spack --help`)
+    if name in __all__:
+        from py2spack import core  # noqa: PLC0415
+
+        return getattr(core, name)
+
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -4,8 +4,6 @@ from __future__ import annotations
 
 import argparse
 
-from py2spack import core
-
 
 def main() -> None:
     """Parses the command line arguments and calls convert_package.
@@ -47,7 +45,19 @@ def main() -> None:
         help="Convert the package, even if a package of the same name already exists in some Spack repo. Will NOT overwrite the existing package. Only applies to the main package to be converted, not to dependencies.",
     )
 
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Maximum number of concurrent downloads (default: 16)",
+    )
+
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    # imported only now, since loading Spack is slow and not needed for e.g. --help
+    from py2spack import core  # noqa: PLC0415
 
     core.convert_package(
         name=args.package,
@@ -56,6 +66,7 @@ def main() -> None:
         repo=args.repo,
         ignore=args.ignore,
         allow_duplicate=args.allow_duplicate,
+        jobs=args.jobs,
     )
 
 
@@ -2,17 +2,89 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import dataclasses
+import functools
+import hashlib
+import importlib.metadata
+import pathlib
+import re
+from typing import TYPE_CHECKING, NamedTuple
 
 from cmake_parser import ast, parser
-from spack import spec
 from spack.util import naming
 
+import py2spack
+from py2spack import spack_utils, utils
 
-CMAKE_VERSION_NUM_COMPONENTS = 4
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
-@dataclasses.dataclass
+    from spack import spec
+
+
+# cmake version: major.minor[.patch[.tweak]], all components are integers
+_VERSION_PATTERN = r"(\d+)\.(\d+)(?:\.(\d+))?(?:\.(\d+))?"
+CMAKE_VERSION_REGEX = re.compile(_VERSION_PATTERN)
+# cmake version or version range: <min>[...<max>]
+CMAKE_VERSION_RANGE_REGEX = re.compile(rf"{_VERSION_PATTERN}(?:\.\.\.{_VERSION_PATTERN})?")
+
+# cmake commands which are converted, all other commands are ignored
+RELEVANT_IDENTIFIERS = frozenset(
+    (
+        "cmake_minimum_required",
+        "find_package",
+        "add_subdirectory",
+    )
+)
+
+# start of a relevant command, at the beginning of a line or directly following
+# another command, up to and including the opening parenthesis
+RELEVANT_COMMAND_START_REGEX = re.compile(
+    r"(?:^|(?<=\)))[ \t]*(cmake_minimum_required|find_package|add_subdirectory)[ \t]*\(",
+    re.MULTILINE | re.IGNORECASE,
+)
+
+# format of the persistent cache of parsed commands. The cached commands are already
+# filtered, so this has to be increased whenever RELEVANT_IDENTIFIERS, the
+# prefiltering in _extract_relevant_commands or the stored format change
+COMMAND_CACHE_FORMAT = 3
+
+# start of a quoted argument, escape sequence, line comment or the arguments of a
+# command, which may contain text that looks like a command
+SKIPPED_TOKEN_START_REGEX = re.compile(r'["\\#(]')
+
+# tokens which have to be considered when searching the end of a command
+COMMAND_TOKEN_REGEX = re.compile(r'[()"\\#]')
+
+
+class CachedArgument(NamedTuple):
+    """Lightweight stand-in for a cmake_parser token, only the value is kept."""
+
+    value: str
+
+
+class CachedCommand(NamedTuple):
+    """Lightweight stand-in for a cmake_parser.ast.Command, as stored in the cache.
+
+    Provides the same `identifier`, `args[i].value` and `line` attributes used by the
+    conversion functions, such that both can be converted interchangeably.
+    """
+
+    identifier: str
+    args: tuple[CachedArgument, ...]
+    line: int
+
+
+@functools.lru_cache(maxsize=512)
+def _simplify_name(name: str) -> str:
+    """Cached version of Spack's naming.simplify_name, package names repeat a lot."""
+    simplified: str = naming.simplify_name(name)
+    return simplified
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class CMakeVersion:
     """Represents versions specified in cmake."""
 
@@ -23,13 +95,15 @@ class CMakeVersion:
 
     def format(self) -> str:
         """Format CMakeVersion as a standard .-separated version string."""
-        components = [self.major, self.minor]
-        if self.patch is not None:
-            components.append(self.patch)
-        if self.tweak is not None:
-            components.append(self.tweak)
+        if self.tweak is None:
+            if self.patch is None:
+                return f"{self.major}.{self.minor}"
+            return f"{self.major}.{self.minor}.{self.patch}"
 
-        return ".".join([str(x) for x in components])
+        if self.patch is None:
+            # not produced by the parser, but a missing component is simply skipped
+            return f"{self.major}.{self.minor}.{self.tweak}"
+        return f"{self.major}.{self.minor}.{self.patch}.{self.tweak}"
 
 
 def _parse_single_version(version_string: str) -> CMakeVersion | None:
@@ -41,24 +115,25 @@ def _parse_single_version(version_string: str) -> CMakeVersion | None:
     Returns:
         A CMakeVersion instance representing that version.
     """
-    components_str = version_string.split(".")
-    if len(components_str) > CMAKE_VERSION_NUM_COMPONENTS:
+    match = CMAKE_VERSION_REGEX.fullmatch(version_string)
+    if match is None:
         return None
-    try:
-        components: list[int | None] = [int(x) for x in components_str]
-        # add None for the missing components
-        components += [None for _ in range(4 - len(components))]
-        # first two components need to be present
-        result = (
-            CMakeVersion(*components)  # type: ignore [arg-type]
-            if not (components[0] is None or components[1] is None)
-            else None
-        )
 
-    except ValueError:
-        result = None
+    return _cmake_version_from_groups(match.groups())
+
 
-    return result
+def _cmake_version_from_groups(groups: tuple[str | None, ...]) -> CMakeVersion:
+    """Create a CMakeVersion from the (major, minor, patch, tweak) regex groups."""
+    major, minor, patch, tweak = groups
+    # for type checker, the first two components are always matched
+    assert major is not None
+    assert minor is not None
+    return CMakeVersion(
+        int(major),
+        int(minor),
+        int(patch) if patch is not None else None,
+        int(tweak) if tweak is not None else None,
+    )
 
 
 def _parse_cmake_version(
@@ -74,21 +149,21 @@ def _parse_cmake_version(
         Either a single CMakeVersion, or a tuple of (min_version, max_version), or
         None if the version could not be parsed.
     """
-    version_range = version_string.split("...")
-    result: CMakeVersion | tuple[CMakeVersion, CMakeVersion] | None = None
-    if len(version_range) == 1:
-        result = _parse_single_version(version_range[0])
-    elif len(version_range) == 2:  # noqa: PLR2004 [magic value]
-        v1 = _parse_single_version(version_range[0])
-        v2 = _parse_single_version(version_range[1])
+    # a single match parses both a version and a version range
+    match = CMAKE_VERSION_RANGE_REGEX.fullmatch(version_string)
+    if match is None:
+        return None
 
-        result = None if v1 is None or v2 is None else (v1, v2)
+    groups = match.groups()
+    min_version = _cmake_version_from_groups(groups[:4])
+    if groups[4] is None:
+        return min_version
 
-    return result
+    return (min_version, _cmake_version_from_groups(groups[4:]))
 
 
 def _convert_cmake_minimum_required(
-    command: ast.Command,
+    command: ast.Command | CachedCommand,
 ) -> spec.Spec:
     """Convert a cmake 'cmake_minimum_required' command to a packaging Requirement.
 
@@ -98,22 +173,32 @@ def _convert_cmake_minimum_required(
     Returns:
         A Spack Spec representing the cmake version constraint.
     """
-    assert len(command.args) >= 2  # noqa: PLR2004 [magic value]
-    version_token = command.args[1]
+    return spack_utils.make_spec(_format_cmake_minimum_required(command))
 
-    cmake_version = _parse_cmake_version(version_token.value)
 
-    if cmake_version is None:
-        result = spec.Spec("cmake")
-    elif isinstance(cmake_version, CMakeVersion):
-        result = spec.Spec(f"cmake @{cmake_version.format()}:")
-    else:
-        result = spec.Spec(f"cmake @{cmake_version[0].format()}:{cmake_version[1].format()}")
+def _format_cmake_minimum_required(command: ast.Command | CachedCommand) -> str:
+    """Get the Spack spec string for a cmake 'cmake_minimum_required' command."""
+    # cmake_minimum_required(VERSION <min>[...<policy_max>]), without a version
+    # only the unconstrained dependency on cmake is known
+    if len(command.args) < 2:  # noqa: PLR2004 [magic value]
+        return "cmake"
+
+    return _format_cmake_version_constraint(_parse_cmake_version(command.args[1].value))
 
-    return result
+
+@functools.lru_cache(maxsize=256)
+def _format_cmake_version_constraint(
+    cmake_version: CMakeVersion | tuple[CMakeVersion, CMakeVersion] | None,
+) -> str:
+    """Get the (cached) spec string for a minimum required cmake version."""
+    if cmake_version is None:
+        return "cmake"
+    if isinstance(cmake_version, CMakeVersion):
+        return f"cmake @{cmake_version.format()}:"
+    return f"cmake @{cmake_version[0].format()}:{cmake_version[1].format()}"
 
 
-def _convert_find_package(command: ast.Command) -> spec.Spec | None:
+def _convert_find_package(command: ast.Command | CachedCommand) -> spec.Spec | None:
     """Convert a cmake 'find_package' command to a Spack spec.
 
     Args:
@@ -122,12 +207,19 @@ def _convert_find_package(command: ast.Command) -> spec.Spec | None:
     Returns:
         A Spack Spec representing the package depedency, or None.
     """
-    assert command.args
+    spec_string = _format_find_package(command)
+    return spack_utils.make_spec(spec_string) if spec_string is not None else None
+
+
+def _format_find_package(command: ast.Command | CachedCommand) -> str | None:
+    """Get the Spack spec string for a cmake 'find_package' command, or None."""
+    if not command.args:
+        return None
 
     package = command.args[0].value
 
     # canonicalize the name for spack
-    package_spack = naming.simplify_name(package)
+    package_spack = _simplify_name(package)
 
     # check if there is a version constraint after the package name
     version = None
@@ -135,11 +227,9 @@ def _convert_find_package(command: ast.Command) -> spec.Spec | None:
         optional_version_token = command.args[1]
         version = _parse_cmake_version(optional_version_token.value)
 
-    # check for the EXACT keyword argument
-    exact_version_modifier = ""
-    for arg in command.args:
-        if arg.value == "EXACT":
-            exact_version_modifier = "="
+    # check for the EXACT keyword argument, stopping at the first occurrence
+    is_exact = any(arg.value == "EXACT" for arg in command.args)
+    exact_version_modifier = "=" if is_exact else ""
 
     version_string = ""
     if isinstance(version, CMakeVersion):
@@ -147,12 +237,10 @@ def _convert_find_package(command: ast.Command) -> spec.Spec | None:
     elif isinstance(version, tuple):
         version_string = f"@{version[0].format()}:{version[1].format()}"
 
-    spec_string = package_spack if version is None else f"{package_spack} {version_string}"
+    return package_spack if version is None else f"{package_spack} {version_string}"
 
-    return spec.Spec(spec_string)
 
-
-def _convert_add_subdirectory(command: ast.Command) -> str | None:
+def _convert_add_subdirectory(command: ast.Command | CachedCommand) -> str | None:
     """Get the specified subdirectory from a cmake 'add_subdirectory' command.
 
     Args:
@@ -161,7 +249,8 @@ def _convert_add_subdirectory(command: ast.Command) -> str | None:
     Returns:
         The relative subdirectory path as a string, or None.
     """
-    assert command.args
+    if not command.args:
+        return None
 
     subdirectory: str = command.args[0].value
     if subdirectory:
@@ -170,6 +259,164 @@ def _convert_add_subdirectory(command: ast.Command) -> str | None:
     return None
 
 
+# functions formatting the cmake commands that specify dependencies as spec strings
+DEPENDENCY_FORMATTERS = {
+    "cmake_minimum_required": _format_cmake_minimum_required,
+    "find_package": _format_find_package,
+}
+
+
+@functools.cache
+def _cmake_parser_version() -> str:
+    try:
+        return importlib.metadata.version("cmake_parser")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _command_cache_file(cmakelists_data: str) -> pathlib.Path:
+    """Get the persistent cache file for the commands parsed from a CMakeLists.txt.
+
+    Cache entries are keyed by the file content, the parser version and the py2spack
+    version and cache format (the commands are stored after filtering), such that
+    entries are never stale.
+    """
+    digest = hashlib.sha256(cmakelists_data.encode()).hexdigest()
+    versions = f"{_cmake_parser_version()}-{py2spack.__version__}-{COMMAND_CACHE_FORMAT}"
+    return utils.get_cache_dir() / "cmake" / f"{digest}-{versions}.json"
+
+
+def _load_cached_commands(cache_file: pathlib.Path) -> tuple[CachedCommand, ...] | None:
+    """Load commands from a cache file, returns None for missing or invalid entries."""
+    data = utils.load_json_cache(cache_file)
+    if not isinstance(data, list):
+        return None
+
+    try:
+        return tuple(
+            CachedCommand(identifier, tuple(CachedArgument(arg) for arg in args), line)
+            for identifier, args, line in data
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_relevant_commands(cmakelists_data: str) -> tuple[CachedCommand, ...]:
+    """Parse a CMakeLists.txt and keep only the commands relevant for conversion.
+
+    Parsing is by far the most expensive part of the conversion, and the same files
+    are encountered repeatedly, e.g. when converting multiple versions of a package,
+    or when py2spack is rerun. The (lightweight) commands are therefore cached both
+    in memory and on disk.
+    """
+    cache_file = _command_cache_file(cmakelists_data)
+    cached = _load_cached_commands(cache_file)
+    if cached is not None:
+        return cached
+
+    commands = tuple(
+        CachedCommand(x.identifier, tuple(CachedArgument(arg.value) for arg in x.args), x.line)
+        for x in parser.parse_raw(_extract_relevant_commands(cmakelists_data), skip_comments=True)
+        if x.identifier in RELEVANT_IDENTIFIERS
+    )
+    utils.save_json_cache(
+        cache_file, [[c.identifier, [arg.value for arg in c.args], c.line] for c in commands]
+    )
+    return commands
+
+
+def _extract_relevant_commands(cmakelists_data: str) -> str:
+    """Reduce a CMakeLists.txt to the commands that are relevant for conversion.
+
+    All other content is removed, except for newlines, such that the line numbers of
+    the remaining commands stay the same. This avoids running the full parser over
+    the (mostly irrelevant) rest of the file. Commands inside quoted arguments,
+    comments or the arguments of other commands are ignored. Files with bracket
+    arguments, which could hide or contain commands, are returned unchanged, as well
+    as files where the end of a command can't be determined.
+    """
+    if "[[" in cmakelists_data or "[=" in cmakelists_data:
+        return cmakelists_data
+
+    parts = []
+    pos = 0
+    # position up to which the file has been scanned for quoted arguments/comments
+    scanned = 0
+    for match in RELEVANT_COMMAND_START_REGEX.finditer(cmakelists_data):
+        start = match.start(1)
+        while scanned < start:
+            skipped = SKIPPED_TOKEN_START_REGEX.search(cmakelists_data, scanned, start)
+            if skipped is None:
+                scanned = start
+            elif skipped.group() == "(":
+                end = _find_command_end(cmakelists_data, skipped.end())
+                if end is None:
+                    return cmakelists_data
+                scanned = end
+            else:
+                scanned = _token_end(cmakelists_data, skipped.start())
+
+        if start < scanned:
+            # inside the arguments of another command, a quoted argument or a comment
+            continue
+
+        end = _find_command_end(cmakelists_data, match.end())
+        if end is None:
+            return cmakelists_data
+
+        parts.append("\n" * cmakelists_data.count("\n", pos, start))
+        parts.append(cmakelists_data[start:end])
+        pos = scanned = end
+
+    parts.append("\n" * cmakelists_data.count("\n", pos))
+    return "".join(parts)
+
+
+def _token_end(cmakelists_data: str, pos: int) -> int:
+    """Get the position after the token starting at 'pos'.
+
+    Quoted arguments, escape sequences and line comments are single tokens (a line
+    comment ends before the newline), every other character is its own token.
+    """
+    length = len(cmakelists_data)
+    char = cmakelists_data[pos]
+    if char == '"':
+        # quoted argument, which may contain escaped quotes
+        pos += 1
+        while pos < length and cmakelists_data[pos] != '"':
+            pos += 2 if cmakelists_data[pos] == "\\" else 1
+        return min(pos + 1, length)
+    if char == "\\":
+        # escaped character, e.g. \(
+        return min(pos + 2, length)
+    if char == "#":
+        newline = cmakelists_data.find("\n", pos)
+        return length if newline == -1 else newline
+    return pos + 1
+
+
+def _find_command_end(cmakelists_data: str, pos: int) -> int | None:
+    """Find the end of a command, given the position after its opening parenthesis.
+
+    Returns:
+        The position after the matching closing parenthesis, or None if there is none.
+    """
+    depth = 1
+    while (token := COMMAND_TOKEN_REGEX.search(cmakelists_data, pos)) is not None:
+        pos = token.start()
+        char = token.group()
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos = _token_end(cmakelists_data, pos)
+
+    return None
+
+
 def convert_cmake_dependencies(
     cmakelists_data: str,
 ) -> tuple[list[tuple[spec.Spec, int]], list[str]]:
@@ -181,34 +428,81 @@ def convert_cmake_dependencies(
     Returns:
         A list of dependencies, as well as a list of subdirectories to search
         for more CMakeLists files. Each dependency consists of the dependency Spec as
-        well as the line number of the original statement.
+        well as the line number of the original statement. Repeated identical
+        dependencies are reported for each line, each with its own Spec.
+        Subdirectories are unique.
     """
-    relevant_identifiers = [
-        "cmake_minimum_required",
-        "find_package",
-        "add_subdirectory",
-    ]
-    nodes = [
-        x
-        for x in parser.parse_raw(cmakelists_data, skip_comments=True)
-        if x.identifier in relevant_identifiers
-    ]
+    nodes = _parse_relevant_commands(cmakelists_data)
 
     dependencies = []
-    subdirectories = []
+    subdirectories: dict[str, None] = {}
 
     for node in nodes:
-        converted_dependency = None
-        if node.identifier == "cmake_minimum_required":
-            converted_dependency = _convert_cmake_minimum_required(node)
-        elif node.identifier == "find_package":
-            converted_dependency = _convert_find_package(node)
+        formatter = DEPENDENCY_FORMATTERS.get(node.identifier)
+        if formatter is not None:
+            spec_string = formatter(node)
+            if spec_string is None:
+                continue
+            # dependencies are formatted as strings first, since the same ones are
+            # often repeated (e.g. in different branches of an if()), and parsing the
+            # Spec is cached
+            dependencies.append((spack_utils.make_spec(spec_string), node.line))
         elif node.identifier == "add_subdirectory":
             subdirectory = _convert_add_subdirectory(node)
             if isinstance(subdirectory, str):
-                subdirectories.append(subdirectory)
+                subdirectories[subdirectory] = None
+
+    return dependencies, list(subdirectories)
+
+
+def convert_cmake_tree(
+    read_file: Callable[[pathlib.Path], str | None], max_workers: int = 1
+) -> list[tuple[spec.Spec, pathlib.Path, int]]:
+    """Convert the dependencies of a tree of CMakeLists.txt files.
+
+    The first CMakeLists.txt is the one in the root directory. Afterwards, any
+    subdirectory specified with 'add_subdirectory(...)' is searched for additional
+    CMakeLists.txt, which are handled identically. The tree is traversed
+    breadth-first, the files of each level are read in parallel but processed in
+    order, which gives the same result as a sequential traversal. Identical files
+    are only parsed once.
+
+    Args:
+        read_file: Function reading a file given its path relative to the root
+            directory, returns None if the file can't be read.
+        max_workers: Maximum number of files read in parallel.
+
+    Returns:
+        A list of dependencies, each consisting of the dependency Spec, the path of
+        the CMakeLists.txt, and the line number of the original statement.
+    """
+    dependencies: list[tuple[spec.Spec, pathlib.Path, int]] = []
+
+    current_level = [pathlib.Path()]
+    visited_subdirectories = set(current_level)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while current_level:
+            file_paths = [subdir / "CMakeLists.txt" for subdir in current_level]
+            all_cmakelists_data = executor.map(read_file, file_paths)
+
+            next_level = []
+            for current_subdir, file_path, cmakelists_data in zip(
+                current_level, file_paths, all_cmakelists_data, strict=True
+            ):
+                if cmakelists_data is None:
+                    continue
+
+                file_dependencies, new_subdirs = convert_cmake_dependencies(cmakelists_data)
+                dependencies.extend((dep, file_path, line_nr) for dep, line_nr in file_dependencies)
+
+                for relative_subdir_path in new_subdirs:
+                    subdir_path = utils.normalize_path(current_subdir / relative_subdir_path)
+
+                    if subdir_path not in visited_subdirectories:
+                        visited_subdirectories.add(subdir_path)
+                        next_level.append(subdir_path)
 
-        if isinstance(converted_dependency, spec.Spec):
-            dependencies.append((converted_dependency, node.line))
+            current_level = next_level
 
-    return dependencies, subdirectories
+    return dependencies
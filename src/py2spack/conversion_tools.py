@@ -5,11 +5,12 @@ Parts of the code are adapted from Spack/Harmen Stoppels: https://github.com/spa
 
 from __future__ import annotations
 
+import bisect
 import dataclasses
 import functools
 import logging
 import re
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import packaging.version as pv
 import spack.error
@@ -18,7 +19,11 @@ from packaging import markers, requirements, specifiers
 from spack import spec, version as sv
 from spack.util import naming
 
-from py2spack import package_providers
+from py2spack import package_providers, spack_utils
+
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
 
 
 # these python versions are not supported anymore, so we shouldn't need to
@@ -29,7 +34,35 @@ UNSUPPORTED_PYTHON = sv.VersionRange(
 
 NAME_REGEX = re.compile(r"[-_.]+")
 
-LOCAL_SEPARATORS_REGEX = re.compile(r"[\._-]")
+# packaging prerelease types (normalized) and their Spack equivalent
+PRERELEASE_TYPES = {"a": sv.common.ALPHA, "b": sv.common.BETA, "rc": sv.common.RC}
+
+# platforms supported by Spack, and alternative names used in markers
+PLATFORMS = ("linux", "cray", "darwin", "windows", "freebsd")
+PLATFORM_ALIASES = {"win32": "windows", "linux2": "linux"}
+
+# PyPI packages whose name already starts with "py-", but which are still prefixed
+# in Spack (e.g. py-spy is py-py-spy)
+DOUBLE_PY_PREFIX_PACKAGES = frozenset(("py-cpuinfo", "py-tes", "py-spy"))
+
+# marker variables which are evaluated
+IMPLEMENTATION_VARIABLES = frozenset(("implementation_name", "platform_python_implementation"))
+PLATFORM_VARIABLES = frozenset(("platform_system", "sys_platform"))
+PYTHON_VERSION_VARIABLES = frozenset(("python_version", "python_full_version"))
+
+# marker operators, flipped for swapping the left- and right-hand side
+FLIPPED_OPERATORS = {
+    op: markers.Op(flipped)  # type: ignore[attr-defined]
+    for op, flipped in (
+        (">", "<"),
+        ("<", ">"),
+        (">=", "<="),
+        ("<=", ">="),
+        ("==", "=="),
+        ("!=", "!="),
+        ("~=", "~="),
+    )
+}
 
 KNOWN_PYTHON_VERSIONS = (
     (3, 6, 15),
@@ -52,8 +85,12 @@ class ConversionError:
     requirement: str | None = None
 
 
+@functools.cache
 def _get_python_versions() -> list[pv.Version]:
-    """Statically evaluate python versions."""
+    """Statically evaluate python versions.
+
+    Cached, the returned list is shared and must not be modified.
+    """
     return [pv.Version(f"{major}.{minor}.{patch}") for major, minor, patch in KNOWN_PYTHON_VERSIONS]
 
 
@@ -64,11 +101,13 @@ def _best_upperbound(curr: sv.StandardVersion, nxt: sv.StandardVersion) -> sv.St
     should happen as high as possible in the version specifier hierarchy.
     """
     assert curr < nxt
+    curr_release = curr.version[0]
+    nxt_release = nxt.version[0]
     i = 0
     m = min(len(curr), len(nxt))
     # find the first level in the version specifier hierarchy where the two
     # versions differ
-    while i < m and curr.version[0][i] == nxt.version[0][i]:
+    while i < m and curr_release[i] == nxt_release[i]:
         i += 1
 
     if i == len(curr) < len(nxt):
@@ -112,58 +151,69 @@ def _best_lowerbound(prev: sv.StandardVersion, curr: sv.StandardVersion) -> sv.S
     """
     assert prev < curr
 
+    curr_release = curr.version[0]
+    prev_release = prev.version[0]
+
     # check if prev is a prerelease of curr
-    if curr.version[0] == prev.version[0]:
+    if curr_release == prev_release:
         return curr
 
     i = 0
-    m = min(len(curr), len(prev))
+    curr_len = len(curr)
+    m = min(curr_len, len(prev))
     while i < m:
-        if prev.version[0][i] < curr.version[0][i]:
+        if prev_release[i] < curr_release[i]:
             return curr.up_to(i + 1)
         i += 1
 
     # both have the same prefix and curr is longer (otherwise we would have
     # found an index i where prev[i] < curr[i], according to invariant)
-    assert len(curr) > len(prev)
+    assert curr_len > len(prev)
 
     # according to invariant, there must be a non-zero value (otherwise the
     # versions would be identical)
-    while i < len(curr) and curr.version[0][i] == 0:
+    while i < curr_len and curr_release[i] == 0:
         i += 1
 
     # necessary in order not to exclude relevant prerelease of curr
     # e.g. if prev = 4.2, curr = 4.3-alpha1
     # we want the bound to be 4.3-alpha1, not 4.3
-    if i >= len(curr):
+    if i >= curr_len:
         return curr
 
     return curr.up_to(i + 1)
 
 
 def packaging_to_spack_version(v: pv.Version) -> sv.StandardVersion:
-    """Convert packaging version to equivalent spack version."""
+    """Convert packaging version to equivalent spack version.
+
+    Conversions are cached, since the same versions are converted repeatedly for
+    different requirements on the same package.
+    """
+    # the cache is keyed on the version string instead of the version itself, since
+    # packaging considers e.g. 1.0 and 1.0.0 equal, while they are distinct in Spack
+    return _packaging_to_spack_version(str(v))
+
+
+@functools.lru_cache(maxsize=8192)
+def _packaging_to_spack_version(version_str: str) -> sv.StandardVersion:
+    v = pv.Version(version_str)
     # TODO @davhofer: better epoch support.
     release = []
     prerelease = [sv.common.FINAL]
     if v.epoch > 0:
-        logging.warning("warning: epoch %s isn't really supported", str(v))
+        logging.warning("warning: epoch %s isn't really supported", v)
         release.append(v.epoch)
     release.extend(v.release)
     separators = ["."] * (len(release) - 1)
 
     if v.pre is not None:
         tp, num = v.pre
-        if tp == "a":
-            prerelease = [sv.common.ALPHA, num]
-        elif tp == "b":
-            prerelease = [sv.common.BETA, num]
-        elif tp == "rc":
-            prerelease = [sv.common.RC, num]
+        prerelease = [PRERELEASE_TYPES[tp], num]
         separators.extend(("-", ""))
 
         if v.post or v.dev or v.local:
-            logging.warning("warning: ignoring post / dev / local version %s", str(v))
+            logging.warning("warning: ignoring post / dev / local version %s", v)
 
     else:
         if v.post is not None:
@@ -173,9 +223,10 @@ def packaging_to_spack_version(v: pv.Version) -> sv.StandardVersion:
             release.extend((sv.version_types.VersionStrComponent("dev"), v.dev))
             separators.extend((".", ""))
         if v.local is not None:
+            # packaging normalizes all local version separators to "."
             local_bits = [
                 int(i) if i.isnumeric() else sv.version_types.VersionStrComponent(i)
-                for i in LOCAL_SEPARATORS_REGEX.split(v.local)
+                for i in v.local.split(".")
             ]
             release.extend(local_bits)
             separators.append("-")
@@ -184,11 +235,10 @@ def packaging_to_spack_version(v: pv.Version) -> sv.StandardVersion:
     separators.append("")
 
     # Reconstruct a string.
-    string = ""
-    for i, rel in enumerate(release):
-        string += f"{rel}{separators[i]}"
+    parts = [f"{rel}{sep}" for rel, sep in zip(release, separators, strict=False)]
     if v.pre:
-        string += f"{sv.common.PRERELEASE_TO_STRING[prerelease[0]]}{prerelease[1]}"
+        parts.append(f"{sv.common.PRERELEASE_TO_STRING[prerelease[0]]}{prerelease[1]}")
+    string = "".join(parts)
 
     return sv.StandardVersion(string, (tuple(release), tuple(prerelease)), separators)
 
@@ -200,6 +250,19 @@ def _version_type_supported(version: pv.Version) -> bool:
     )
 
 
+def spack_versions_sorted(versions: Iterable[pv.Version]) -> list[sv.StandardVersion]:
+    """Convert packaging versions to Spack versions, sorted in Spack's order.
+
+    Versions which can't be represented accurately in Spack are excluded.
+    """
+    # NOTE: Prereleases as well as post, dev, and local versions are not supported and
+    # will be excluded!
+
+    # Sort in Spack's order, which should in principle coincide with
+    # packaging's order, but may not in unforseen edge cases.
+    return sorted(packaging_to_spack_version(v) for v in versions if _version_type_supported(v))
+
+
 def condensed_version_list(
     _subset_of_versions: list[pv.Version], _all_versions: list[pv.Version]
 ) -> sv.VersionList:
@@ -215,23 +278,25 @@ def condensed_version_list(
         version in _all_versions which is not in _subset_of_versions.
 
     """
-    # for now, don't support prereleases etc.
-    subset_filtered = list(filter(_version_type_supported, _subset_of_versions))
-    all_versions_filtered = list(filter(_version_type_supported, _all_versions))
+    return condensed_spack_version_list(
+        spack_versions_sorted(_subset_of_versions), spack_versions_sorted(_all_versions)
+    )
 
-    # NOTE: Prereleases as well as post, dev, and local versions are not supported and
-    # will be excluded!
 
-    # Sort in Spack's order, which should in principle coincide with
-    # packaging's order, but may not in unforseen edge cases.
-    subset = sorted(packaging_to_spack_version(v) for v in subset_filtered)
-    all_versions = sorted(packaging_to_spack_version(v) for v in all_versions_filtered)
+def condensed_spack_version_list(
+    subset: Sequence[sv.StandardVersion], all_versions: Sequence[sv.StandardVersion]
+) -> sv.VersionList:
+    """Create condensed list of version ranges from prepared Spack versions.
 
+    Same as `condensed_version_list`, but both arguments must already be converted
+    and sorted with `spack_versions_sorted`. This allows the list of all versions
+    of a package to be prepared once and reused.
+    """
     if len(subset) == 0:
         return sv.VersionList([])
 
-    # Find corresponding index
-    i, j = all_versions.index(subset[0]) + 1, 1
+    # Find corresponding index, all_versions is sorted so a binary search suffices
+    i, j = bisect.bisect_left(all_versions, subset[0]) + 1, 1
     new_versions: list[sv.ClosedOpenRange] = []
 
     # If the first when entry corresponds to the first known version, use
@@ -245,7 +310,7 @@ def condensed_version_list(
         if all_versions[i] != subset[j]:
             hi = _best_upperbound(subset[j - 1], all_versions[i])
             new_versions.append(sv.VersionRange(lo, hi))
-            i = all_versions.index(subset[j])
+            i = bisect.bisect_left(all_versions, subset[j], lo=i)
             lo = _best_lowerbound(all_versions[i - 1], subset[j])
         i += 1
         j += 1
@@ -262,7 +327,6 @@ def condensed_version_list(
     return sv.VersionList(new_versions)
 
 
-@functools.cache
 def _pkg_specifier_set_to_version_list(
     pkg: str,
     specifier_set: specifiers.SpecifierSet,
@@ -279,15 +343,53 @@ def _pkg_specifier_set_to_version_list(
         A version list including only the versions of the package that match the
             version constraints from the specifier set and none others.
     """
-    all_versions = _get_python_versions() if pkg == "python" else provider.get_versions(pkg)
+    # the cached version list is copied, as callers may modify it in place
+    return _specifier_str_to_version_list(pkg, str(specifier_set), provider).copy()
+
+
+@functools.lru_cache(maxsize=4096)
+def _specifier_str_to_version_list(
+    pkg: str,
+    specifier_str: str,
+    provider: package_providers.PackageProvider,
+) -> sv.VersionList:
+    """Cached implementation of `_pkg_specifier_set_to_version_list`.
+
+    The specifier set is passed as a string, which is cheaper to hash.
+    """
+    specifier_set = specifiers.SpecifierSet(specifier_str)
+    all_versions = _get_package_versions(pkg, provider)
     result = sv.VersionList()
     if not isinstance(all_versions, package_providers.PackageProviderQueryError):
         matching = [s for s in all_versions if specifier_set.contains(s, prereleases=True)]
         if matching:
-            result = condensed_version_list(matching, all_versions)
+            result = condensed_spack_version_list(
+                spack_versions_sorted(matching), _get_spack_versions_sorted(pkg, provider)
+            )
     return result
 
 
+def _get_package_versions(
+    pkg: str, provider: package_providers.PackageProvider
+) -> list[pv.Version] | package_providers.PackageProviderQueryError:
+    """Look up all known versions of a package (static list for python)."""
+    return _get_python_versions() if pkg == "python" else provider.get_versions(pkg)
+
+
+@functools.lru_cache(maxsize=1024)
+def _get_spack_versions_sorted(
+    pkg: str, provider: package_providers.PackageProvider
+) -> tuple[sv.StandardVersion, ...]:
+    """All versions of a package, prepared with `spack_versions_sorted`.
+
+    Cached, such that the conversion and sorting only happens once per package.
+    """
+    all_versions = _get_package_versions(pkg, provider)
+    if isinstance(all_versions, package_providers.PackageProviderQueryError):
+        return ()
+    return tuple(spack_versions_sorted(all_versions))
+
+
 def _eval_python_version_marker(
     op: str, value: str, provider: package_providers.PackageProvider
 ) -> sv.VersionList | None:
@@ -334,30 +436,64 @@ def _simplify_python_constraint(versions: sv.VersionList) -> None:
         vs[0] = union
 
 
-def _eval_platform_constraint(
+@functools.cache
+def _platform_specs(platform: str, *, negated: bool) -> tuple[spec.Spec, ...]:
+    """Specs for the given platform, or for all other platforms if negated."""
+    return tuple(spec.Spec(f"platform={p}") for p in PLATFORMS if (p != platform) == negated)
+
+
+def _eval_implementation_constraint(
+    node: tuple[markers.Variable, markers.Op, markers.Value],  # type: ignore[name-defined]
+    _provider: package_providers.PackageProvider,
+) -> bool | list[spec.Spec] | None:
+    # Statically evaluate implementation name, since all we support is cpython
+    _, op, value = node
+
+    if op.value == "==":
+        return bool(value.value.lower() == "cpython")
+
+    if op.value == "!=":
+        return bool(value.value.lower() != "cpython")
+
+    return None
+
+
+def _eval_extra_constraint(
     node: tuple[markers.Variable, markers.Op, markers.Value],  # type: ignore[name-defined]
+    _provider: package_providers.PackageProvider,
 ) -> bool | list[spec.Spec] | None:
-    platforms = ("linux", "cray", "darwin", "windows", "freebsd")
+    _, op, value = node
+
+    try:
+        if op.value == "==":
+            return [spack_utils.make_spec(f"+{value.value}")]
+
+        if op.value == "!=":
+            return [spack_utils.make_spec(f"~{value.value}")]
+
+    except (spack.parser.SpecSyntaxError, ValueError) as e:
+        logging.warning("could not parse `%s` as variant: %s", str(value), str(e))
+
+    return None
 
+
+def _eval_platform_constraint(
+    node: tuple[markers.Variable, markers.Op, markers.Value],  # type: ignore[name-defined]
+    _provider: package_providers.PackageProvider,
+) -> bool | list[spec.Spec] | None:
     variable, op, value = node
 
-    assert variable.value in {"platform_system", "sys_platform"}
+    assert variable.value in PLATFORM_VARIABLES
 
     if op.value not in {"==", "!="}:
         return None
 
     platform = value.value.lower()
-    if platform == "win32":
-        platform = "windows"
-    elif platform == "linux2":
-        platform = "linux"
-
-    if platform in platforms:
-        return [
-            spec.Spec(f"platform={p}")
-            for p in platforms
-            if (p != platform and op.value == "!=") or (p == platform and op.value == "==")
-        ]
+    platform = PLATFORM_ALIASES.get(platform, platform)
+
+    if platform in PLATFORMS:
+        # the cached Specs are copied, as callers may modify them
+        return [s.copy() for s in _platform_specs(platform, negated=op.value == "!=")]
     # TODO @davhofer: NOTE: in the case of != above, this will return a list of
     # [platform=windows, platform=linux, ...] => this means it is an OR of
     # the list... is this always the case? handled correctly?
@@ -371,11 +507,9 @@ def _eval_python_constraint(
     provider: package_providers.PackageProvider,
 ) -> bool | list[spec.Spec] | None:
     variable, op, value = node
-    versions = _eval_python_version_marker(op.value, value.value, provider)
+    versions = _simplified_python_versions(op.value, value.value, provider)
 
     if versions is not None:
-        _simplify_python_constraint(versions)
-
         if not versions:
             # No supported versions for python remain, so statically false.
             return False
@@ -384,13 +518,38 @@ def _eval_python_constraint(
             # No constraints on python, so statically true.
             return True
 
-        sp = spec.Spec("^python")
-        sp.dependencies("python")[0].versions = versions
+        sp = spack_utils.make_spec("^python")
+        sp.dependencies("python")[0].versions = versions.copy()
         return [sp]
 
     return None
 
 
+@functools.lru_cache(maxsize=1024)
+def _simplified_python_versions(
+    op: str, value: str, provider: package_providers.PackageProvider
+) -> sv.VersionList | None:
+    """Evaluate a python version constraint marker and simplify the result.
+
+    Cached, since python version markers (e.g. `python_version >= "3.8"`) are
+    repeated across most requirements, and are usually found to be statically true.
+    The returned version list must not be modified.
+    """
+    versions = _eval_python_version_marker(op, value, provider)
+    if versions is not None:
+        _simplify_python_constraint(versions)
+    return versions
+
+
+# functions evaluating a marker constraint, by the name of the marker variable
+MARKER_VARIABLE_EVALUATORS = {
+    **dict.fromkeys(IMPLEMENTATION_VARIABLES, _eval_implementation_constraint),
+    **dict.fromkeys(PLATFORM_VARIABLES, _eval_platform_constraint),
+    **dict.fromkeys(PYTHON_VERSION_VARIABLES, _eval_python_constraint),
+    "extra": _eval_extra_constraint,
+}
+
+
 def _eval_constraint(
     node: tuple[markers.Variable, markers.Op, markers.Value],  # type: ignore[name-defined]
     provider: package_providers.PackageProvider,
@@ -410,50 +569,18 @@ def _eval_constraint(
 
     # Flip the comparison if the value is on the left-hand side.
     if isinstance(variable, markers.Value) and isinstance(value, markers.Variable):  # type: ignore[attr-defined]
-        flipped_op = {
-            ">": "<",
-            "<": ">",
-            ">=": "<=",
-            "<=": ">=",
-            "==": "==",
-            "!=": "!=",
-            "~=": "~=",
-        }.get(op.value)
+        flipped_op = FLIPPED_OPERATORS.get(op.value)
         if flipped_op is None:
             logging.warning("do not know how to evaluate `%s`", str(node))
             return None
-        variable, op, value = value, markers.Op(flipped_op), variable  # type: ignore[attr-defined]
-
-    return_val: bool | list[spec.Spec] | None = None
-
-    # Statically evaluate implementation name, since all we support is cpython
-    if variable.value in {"implementation_name", "platform_python_implementation"}:
-        if op.value == "==":
-            return_val = bool(value.value.lower() == "cpython")
-
-        if op.value == "!=":
-            return_val = bool(value.value.lower() != "cpython")
-
-    elif variable.value in {"platform_system", "sys_platform"}:
-        return_val = _eval_platform_constraint(node)
-
-    elif variable.value in ("python_version", "python_full_version"):
-        return_val = _eval_python_constraint(node, provider)
+        variable, op, value = value, flipped_op, variable
+        node = (variable, op, value)
 
-    else:
-        try:
-            if variable.value == "extra":
-                if op.value == "==":
-                    return_val = [spec.Spec(f"+{value.value}")]
-
-                if op.value == "!=":
-                    return_val = [spec.Spec(f"~{value.value}")]
-
-        except (spack.parser.SpecSyntaxError, ValueError) as e:
-            logging.warning("could not parse `%s` as variant: %s", str(value), str(e))
-            return None
+    evaluate = MARKER_VARIABLE_EVALUATORS.get(variable.value)
+    if evaluate is None:
+        return None
 
-    return return_val
+    return evaluate(node, provider)
 
 
 def _eval_node(
@@ -465,6 +592,18 @@ def _eval_node(
     return _do_evaluate_marker(node, provider)
 
 
+def _unique_specs(specs: list[spec.Spec]) -> list[spec.Spec]:
+    """Remove duplicate specs, preserving the order.
+
+    Specs are compared by their string representation, which is cheaper than
+    hashing and comparing the Specs themselves.
+    """
+    unique: dict[str, spec.Spec] = {}
+    for s in specs:
+        unique.setdefault(str(s), s)
+    return list(unique.values())
+
+
 def _intersection(lhs: list[spec.Spec], rhs: list[spec.Spec]) -> list[spec.Spec]:
     """Compute intersection of spec lists.
 
@@ -473,15 +612,19 @@ def _intersection(lhs: list[spec.Spec], rhs: list[spec.Spec]) -> list[spec.Spec]
     """
     specs: list[spec.Spec] = []
     for expr in lhs:
+        # specs without dependencies (e.g. only a platform or variant) can be copied
+        # without traversing the dependency DAG
+        copy_deps = bool(expr.dependencies())
         for r in rhs:
-            intersection = expr.copy()
+            intersection = expr.copy(deps=copy_deps)
             try:
                 intersection.constrain(r)
             except spack.error.UnsatisfiableSpecError:
                 # empty intersection
                 continue
             specs.append(intersection)
-    return list(set(specs))
+    # a single (or no) intersection needs no deduplication, this is the common case
+    return specs if len(specs) <= 1 else _unique_specs(specs)
 
 
 def _union(lhs: list[spec.Spec], rhs: list[spec.Spec]) -> list[spec.Spec]:
@@ -496,7 +639,7 @@ def _union(lhs: list[spec.Spec], rhs: list[spec.Spec]) -> list[spec.Spec]:
             expr.versions.add(python.versions)
         return lhs
 
-    return list(set(lhs + rhs))
+    return _unique_specs(lhs + rhs)
 
 
 def _eval_and(
@@ -571,21 +714,19 @@ def evaluate_marker(
 
 
 # TODO @davhofer: verify whether spack name actually corresponds to PyPI package
+@functools.lru_cache(maxsize=4096)
 def pkg_to_spack_name(name: str) -> str:
-    """Convert PyPI package name to Spack python package name."""
+    """Convert PyPI package name to Spack python package name.
+
+    Results are cached, as the same names are converted for every requirement.
+    """
     spack_name: str = naming.simplify_name(name)
 
     # in general, if the package name already contains the "py-" prefix, we
     # don't want to add it again. exception: 3 existing packages on spack
     # with double "py-" prefix
     if spack_name != "python" and (
-        not spack_name.startswith("py-")
-        or spack_name
-        in {
-            "py-cpuinfo",
-            "py-tes",
-            "py-spy",
-        }
+        not spack_name.startswith("py-") or spack_name in DOUBLE_PY_PREFIX_PACKAGES
     ):
         spack_name = f"py-{spack_name}"
 
@@ -648,7 +789,7 @@ def convert_requirement(
     # the main package for which this requirement is necessary
     if r.extras is not None:
         for extra in r.extras:
-            requirement_spec.constrain(spec.Spec(f"+{extra}"))
+            requirement_spec.constrain(spack_utils.make_spec(f"+{extra}"))
 
     if r.specifier is not None:
         vlist = _pkg_specifier_set_to_version_list(r.name, r.specifier, provider)
@@ -667,6 +808,6 @@ def convert_requirement(
     if from_extra is not None:
         # further constrain when_specs with extra
         for when_spec in when_spec_list:
-            when_spec.constrain(spec.Spec(f"+{from_extra}"))
+            when_spec.constrain(spack_utils.make_spec(f"+{from_extra}"))
 
     return [(requirement_spec, when_spec) for when_spec in when_spec_list]
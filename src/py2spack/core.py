@@ -2,11 +2,15 @@
 
 from __future__ import annotations
 
+import collections
+import concurrent.futures
 import dataclasses
+import functools
+import io
+import itertools
 import logging
-import pathlib
 import sys
-from typing import TextIO
+from typing import TYPE_CHECKING, TextIO
 
 from packaging import requirements, specifiers, version as pv
 from spack import spec, version as sv
@@ -22,7 +26,27 @@ from py2spack import (
 )
 
 
-SPACK_CHECKSUM_HASHES = ["md5", "sha1", "sha224", "sha256", "sha384", "sha512"]
+if TYPE_CHECKING:
+    import pathlib
+
+
+# hash algorithms accepted by Spack for checksums, in order of preference (sha256
+# is what Spack itself uses by default)
+SPACK_CHECKSUM_HASHES = ("sha256", "sha512", "sha384", "sha224", "sha1", "md5")
+
+# unconstrained Spec, for comparisons only (must not be modified)
+EMPTY_SPEC = spec.Spec()
+
+# upper limit on the number of packages that are converted concurrently
+MAX_CONCURRENT_CONVERSIONS = 8
+
+# header of every package.py
+SPACK_COPYRIGHT_HEADER = """\
+# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
+# Spack Project Developers. See the top-level COPYRIGHT file for details.
+#
+# SPDX-License-Identifier: (Apache-2.0 OR MIT)
+"""
 
 
 @dataclasses.dataclass(frozen=True)
@@ -45,7 +69,13 @@ class DependencyConflictError:
     msg: str
 
 
-def _format_types(types: set[str]) -> str:
+def _format_types(types: set[str] | frozenset[str]) -> str:
+    # the same few combinations of types are formatted for every dependency
+    return _format_types_cached(frozenset(types))
+
+
+@functools.cache
+def _format_types_cached(types: frozenset[str]) -> str:
     if len(types) == 1:
         t = next(iter(types))
         return f'"{t}"'
@@ -53,6 +83,20 @@ def _format_types(types: set[str]) -> str:
     return str(tuple(sorted(types))).replace("'", '"')
 
 
+def _requirement_sort_key(
+    req: tuple[spec.Spec, spec.Spec],
+) -> tuple[bool, bool, str, sv.VersionList, str]:
+    """Helper function for sorting requirements in the package.py.
+
+    Dependencies are sorted in the package.py according to is_python,
+    has_variant, pkg_name, pkg_version_list, variant string, in that order.
+    """
+    dep, when = req
+    variant = str(when.variants)
+    # != because we want python to come first
+    return (dep.name != "python", bool(variant), dep.name, dep.versions, variant)
+
+
 def _format_dependency(
     dependency_spec: spec.Spec,
     when_spec: spec.Spec,
@@ -75,9 +119,11 @@ def _format_dependency(
     prefix = f'depends_on("{dependency_spec!s}"'
 
     when_str = ""
-    if when_spec is not None and when_spec != spec.Spec():
+    if when_spec is not None and when_spec != EMPTY_SPEC:
         if when_spec.architecture:
             platform_str = f"platform={when_spec.platform}"
+            # the platform is printed first, the caller's spec is left unchanged
+            when_spec = when_spec.copy()
             when_spec.architecture = None
         else:
             platform_str = ""
@@ -92,6 +138,18 @@ def _format_dependency(
     return f"{prefix}{when_str}{type_str})"
 
 
+def _intersects(spec1: spec.Spec, spec2: spec.Spec, cache: dict[tuple[int, int], bool]) -> bool:
+    """Check whether two specs intersect, using a cache keyed on their identities.
+
+    The specs must be kept alive as long as the cache is used.
+    """
+    key = (id(spec1), id(spec2)) if id(spec1) < id(spec2) else (id(spec2), id(spec1))
+    result = cache.get(key)
+    if result is None:
+        result = cache[key] = spec1.intersects(spec2)
+    return result
+
+
 def _find_dependency_satisfiability_conflicts(
     dependency_list: list[tuple[spec.Spec, spec.Spec, set[str]]],
 ) -> list[DependencyConflictError]:
@@ -116,17 +174,30 @@ def _find_dependency_satisfiability_conflicts(
     """
     dependency_conflicts: list[DependencyConflictError] = []
 
-    dependency_names = list({dep[0].name for dep in dependency_list if dep[0].name is not None})
+    # the same when specs are compared against each other for many dependencies,
+    # the results are cached by the identity of the specs
+    intersects_cache: dict[tuple[int, int], bool] = {}
 
-    for name in dependency_names:
-        pkg_dependencies = [dep for dep in dependency_list if dep[0].name == name]
+    # group the dependencies by package name in a single pass
+    dependencies_by_name: dict[str, list[tuple[spec.Spec, spec.Spec, set[str]]]] = {}
+    for dep in dependency_list:
+        if dep[0].name is not None:
+            dependencies_by_name.setdefault(dep[0].name, []).append(dep)
 
+    for pkg_dependencies in dependencies_by_name.values():
         for i in range(len(pkg_dependencies)):
             for j in range(i + 1, len(pkg_dependencies)):
                 dep1, when1, types1 = pkg_dependencies[i]
                 dep2, when2, types2 = pkg_dependencies[j]
 
-                if when1.intersects(when2) and (not dep1.intersects(dep2)):
+                # identical dependency specs always intersect, no need to check
+                # the (more expensive) intersection of the when specs
+                if dep1 == dep2:
+                    continue
+
+                if _intersects(when1, when2, intersects_cache) and not _intersects(
+                    dep1, dep2, intersects_cache
+                ):
                     dep_str1 = _format_dependency(dep1, when1, dep_types=types1)
                     dep_str2 = _format_dependency(dep2, when2, dep_types=types2)
                     dependency_conflicts.append(
@@ -139,19 +210,12 @@ def _people_to_strings(
     parsed_people: list[tuple[str | None, str | None]],
 ) -> list[str]:
     """Convert 'authors' or 'maintainers' to a simple list of strings."""
-    people: list[str] = []
-
-    for p0, p1 in parsed_people:
-        if p0 is None and p1 is None:
-            continue
-        if isinstance(p1, str) and p0 is None:
-            people.append(p1)
-        elif isinstance(p0, str) and p1 is None:
-            people.append(p0)
-        else:
-            people.append(f"{p0}, {p1}")
-
-    return people
+    # "name", "email" or "name, email", depending on what is given
+    return [
+        ", ".join(p for p in person if p is not None)
+        for person in parsed_people
+        if person != (None, None)
+    ]
 
 
 @dataclasses.dataclass
@@ -346,8 +410,8 @@ class SpackPyPkg:
     # store all (python package) dependencies of the package (with their original name,
     # not converted to spack)
     original_dependencies: set[str] = dataclasses.field(default_factory=set)
-    _dependencies_by_type: dict[str, list[tuple[spec.Spec, spec.Spec]]] = dataclasses.field(
-        default_factory=dict
+    _dependencies_by_type: collections.defaultdict[str, list[tuple[spec.Spec, spec.Spec]]] = (
+        dataclasses.field(default_factory=lambda: collections.defaultdict(list))
     )
     _file_parse_errors: list[tuple[str, ParseError]] = dataclasses.field(default_factory=list)
     _metadata_parse_errors: dict[str, list[pyproject_parsing.ConfigurationError]] = (
@@ -364,12 +428,12 @@ class SpackPyPkg:
     )
     # map each unique dependency (dependency spec, when spec) to a
     # list of package versions that have this dependency
-    _specs_to_versions: dict[tuple[spec.Spec, spec.Spec], list[pv.Version]] = dataclasses.field(
-        default_factory=dict
+    _specs_to_versions: collections.defaultdict[tuple[spec.Spec, spec.Spec], list[pv.Version]] = (
+        dataclasses.field(default_factory=lambda: collections.defaultdict(list))
     )
     # map dependencies to their dependency types (build, run, test, ...)
-    _specs_to_types: dict[tuple[spec.Spec, spec.Spec], set[str]] = dataclasses.field(
-        default_factory=dict
+    _specs_to_types: collections.defaultdict[tuple[spec.Spec, spec.Spec], set[str]] = (
+        dataclasses.field(default_factory=lambda: collections.defaultdict(set))
     )
     cmake_dependency_names: set[str] = dataclasses.field(default_factory=set)
     _cmake_dependencies_with_sources: dict[
@@ -387,12 +451,10 @@ class SpackPyPkg:
         self._homepage = pyproject.homepage
 
         if pyproject.authors is not None:
-            for elem in pyproject.authors:
-                self._authors.append(elem)
+            self._authors.extend(pyproject.authors)
 
         if pyproject.maintainers is not None:
-            for elem in pyproject.maintainers:
-                self._maintainers.append(elem)
+            self._maintainers.extend(pyproject.maintainers)
 
         if pyproject.license:
             self._license = pyproject.license
@@ -476,11 +538,23 @@ class SpackPyPkg:
 
         final_dependency_list: list[tuple[spec.Spec, spec.Spec, set[str]]] = []
 
+        # most dependencies apply to the same sets of versions (e.g. all of them, or
+        # every dependency if only a single version is converted), so each distinct
+        # version list is only condensed once
+        condensed_version_lists: dict[tuple[str, ...], sv.VersionList] = {}
+
+        # the list of all versions is the same for every dependency, prepare it once
+        all_versions_sorted = conversion_tools.spack_versions_sorted(self.all_versions)
+
         for (dep_spec, when_spec), vlist in self._specs_to_versions.items():
             types = self._specs_to_types[dep_spec, when_spec]
 
-            versions_condensed = conversion_tools.condensed_version_list(vlist, self.all_versions)
-            when_spec.versions = versions_condensed
+            vlist_key = tuple(str(v) for v in vlist)
+            if vlist_key not in condensed_version_lists:
+                condensed_version_lists[vlist_key] = conversion_tools.condensed_spack_version_list(
+                    conversion_tools.spack_versions_sorted(vlist), all_versions_sorted
+                )
+            when_spec.versions = condensed_version_lists[vlist_key].copy()
             final_dependency_list.append((dep_spec, when_spec, types))
 
         # check for conflicts
@@ -498,9 +572,6 @@ class SpackPyPkg:
             # the package.py, e.g. '("build", "run")'.
             canonical_typestring = _format_types(types)
 
-            if canonical_typestring not in self._dependencies_by_type:
-                self._dependencies_by_type[canonical_typestring] = []
-
             self._dependencies_by_type[canonical_typestring].append((dep_spec, when_spec))
 
     def _requirement_from_pyproject(
@@ -539,18 +610,11 @@ class SpackPyPkg:
         # for each spec, add the current version to the list of versions which have this
         # spec as a requirement
         for specs in spec_list:
-            if specs not in self._specs_to_versions:
-                self._specs_to_versions[specs] = []
-
             # add the current version to this dependency
             self._specs_to_versions[specs].append(pyproject_version)
 
-            if specs not in self._specs_to_types:
-                self._specs_to_types[specs] = set()
-
             # add build dependency
-            for t in dependency_types:
-                self._specs_to_types[specs].add(t)
+            self._specs_to_types[specs].update(dependency_types)
 
     def build_from_pyprojects(
         self,
@@ -570,8 +634,6 @@ class SpackPyPkg:
         self.num_converted_versions = len(pyprojects)
 
         # get parsed versions with hashes (for display in package.py)
-        # pyprojects are already in reverse order,
-        # s.t. newest version is on top in package.py
         for p in pyprojects:
             spack_version = conversion_tools.packaging_to_spack_version(p.version)
 
@@ -579,15 +641,31 @@ class SpackPyPkg:
                 hashdict = p.provider.get_sdist_hash(name, p.version)
 
                 if isinstance(hashdict, dict) and hashdict:
-                    hash_key, hash_value = next(iter(hashdict.items()))
-
-                    # check if the used hash algo is accepted by Spack
-                    if hash_key in SPACK_CHECKSUM_HASHES:
-                        self._versions_with_checksum.append((spack_version, hash_key, hash_value))
+                    # use the preferred hash algorithm accepted by Spack
+                    hash_key = next((h for h in SPACK_CHECKSUM_HASHES if h in hashdict), None)
+                    if hash_key is not None:
+                        self._versions_with_checksum.append(
+                            (spack_version, hash_key, hashdict[hash_key])
+                        )
                         continue
 
             self._versions_missing_checksum.append(spack_version)
 
+        # pyprojects are usually already in reverse order, but sort once in Spack's
+        # order to be sure that the newest version is on top in package.py
+        self._versions_with_checksum.sort(key=lambda v: v[0], reverse=True)
+        self._versions_missing_checksum.sort(reverse=True)
+
+        # query the versions of all dependencies concurrently, such that the version
+        # lookups during the conversion of the requirements are served from the cache
+        pypi_provider.prefetch_versions(
+            r.name
+            for p in pyprojects
+            for r in itertools.chain(
+                p.build_requires, p.dependencies, *p.optional_dependencies.values()
+            )
+        )
+
         # convert all dependencies (for the selected versions)
         self._dependencies_from_pyprojects(pyprojects, pypi_provider)
 
@@ -595,79 +673,68 @@ class SpackPyPkg:
         """Format and write the package to 'outfile'.
 
         By default outfile=sys.stdout. The package can be written directly to a
-        package.py file by supplying the corresponding opened file object.
+        package.py file by supplying the corresponding opened file object. The
+        lines are collected first and written to 'outfile' in a single call.
         """
-        cpright = """\
-# Copyright 2013-2024 Lawrence Livermore National Security, LLC and other
-# Spack Project Developers. See the top-level COPYRIGHT file for details.
-#
-# SPDX-License-Identifier: (Apache-2.0 OR MIT)
-"""
+        lines: list[str] = [SPACK_COPYRIGHT_HEADER]
 
-        print(cpright, file=outfile)
+        lines.append("from spack.package import *")
+        lines.append("")
 
-        print("from spack.package import *", file=outfile)
-        print("", file=outfile)
-
-        print(
-            f"class {naming.mod_to_class(self.name)}(PythonPackage):",
-            file=outfile,
-        )
+        lines.append(f"class {naming.mod_to_class(self.name)}(PythonPackage):")
 
         if self._description is not None and len(self._description) > 0:
-            print(f'    """{self._description}"""', file=outfile)
+            lines.append(f'    """{self._description}"""')
         else:
             txt = '    """FIXME: Put a proper description' ' of your package here."""'
-            print(txt, file=outfile)
+            lines.append(txt)
 
-        print("", file=outfile)
+        lines.append("")
 
         if self._homepage:
-            print(f'    homepage = "{self._homepage}"', file=outfile)
+            lines.append(f'    homepage = "{self._homepage}"')
         else:
-            print("    # FIXME: add homepage", file=outfile)
-            print('    # homepage = ""', file=outfile)
+            lines.append("    # FIXME: add homepage")
+            lines.append('    # homepage = ""')
 
         if self.pypi:
-            print(f'    pypi = "{self.pypi}"', file=outfile)
+            lines.append(f'    pypi = "{self.pypi}"')
         elif self.git:
-            print(f'    url = "{self.url}"', file=outfile)
-            print(f'    git = "{self.git}"', file=outfile)
+            lines.append(f'    url = "{self.url}"')
+            lines.append(f'    git = "{self.git}"')
 
-        print("", file=outfile)
+        lines.append("")
 
         if self._license:
-            print("    # FIXME: check license", file=outfile)
-            print(f'    license("{self._license}")', file=outfile)
+            lines.append("    # FIXME: check license")
+            lines.append(f'    license("{self._license}")')
         else:
-            print("    # FIXME: add license", file=outfile)
+            lines.append("    # FIXME: add license")
 
-        print("", file=outfile)
+        lines.append("")
 
-        print("    # FIXME: add github names for maintainers", file=outfile)
-        print('    # maintainers("...")', file=outfile)
+        lines.append("    # FIXME: add github names for maintainers")
+        lines.append('    # maintainers("...")')
         if self._authors:
-            print("    # Authors:", file=outfile)
-            for author in self._authors:
-                print(f"    # {author}", file=outfile)
+            lines.append("    # Authors:")
+            lines.extend(f"    # {author}" for author in self._authors)
 
         if self._maintainers:
-            print("    # Maintainers:", file=outfile)
-            for maintainer in self._maintainers:
-                print(f"    # {maintainer}", file=outfile)
+            lines.append("    # Maintainers:")
+            lines.extend(f"    # {maintainer}" for maintainer in self._maintainers)
 
-        print("", file=outfile)
+        lines.append("")
 
-        for v, hash_type, hash_value in self._versions_with_checksum:
-            print(f'    version("{v!s}", {hash_type}="{hash_value}")', file=outfile)
+        lines.extend(
+            f'    version("{v!s}", {hash_type}="{hash_value}")'
+            for v, hash_type, hash_value in self._versions_with_checksum
+        )
 
         if self._versions_missing_checksum:
-            print("", file=outfile)
-            print("    # FIXME: add hashes/checksums for the following versions", file=outfile)
-            for v in self._versions_missing_checksum:
-                print(f'    version("{v!s}")', file=outfile)
+            lines.extend(("", "    # FIXME: add hashes/checksums for the following versions"))
+            lines.extend(f'    version("{v!s}")' for v in self._versions_missing_checksum)
 
-        print("", file=outfile)
+        lines.append("")
 
         # fix-me for unparsed versions
         if self._file_parse_errors:
@@ -675,99 +742,76 @@ class SpackPyPkg:
                 "    # FIXME: the pyproject.toml files for the following "
                 "versions could not be parsed"
             )
-            print(txt, file=outfile)
-            for v, p_err in self._file_parse_errors:
-                print(f"    # version {v!s}: {p_err.msg}", file=outfile)
+            lines.append(txt)
+            lines.extend(
+                f"    # version {v!s}: {p_err.msg}" for v, p_err in self._file_parse_errors
+            )
 
-            print("", file=outfile)
+            lines.append("")
 
-        for v in self._variants:
-            print(f'    variant("{v}", default=False)', file=outfile)
+        lines.extend(f'    variant("{v}", default=False)' for v in self._variants)
 
-        print("", file=outfile)
+        lines.append("")
 
         if self.dependency_parse_errors:
             txt = "    # FIXME: the following dependencies could not be parsed"
-            print(txt, file=outfile)
+            lines.append(txt)
             for v, cfg_errs in self.dependency_parse_errors.items():
-                print(f"    # version {v!s}:", file=outfile)
-                for cfg_err in cfg_errs:
-                    print(f"    #    {cfg_err.msg}", file=outfile)
+                lines.append(f"    # version {v!s}:")
+                lines.extend(f"    #    {cfg_err.msg}" for cfg_err in cfg_errs)
 
-            print("", file=outfile)
+            lines.append("")
 
         if self.dependency_conversion_errors:
             txt = (
                 "    # FIXME: the following dependencies could be parsed but "
                 "not converted to spack"
             )
-            print(txt, file=outfile)
+            lines.append(txt)
             for v, cnv_errs in self.dependency_conversion_errors.items():
-                print(f"    # version {v!s}:", file=outfile)
-                for cnv_err in cnv_errs:
-                    print(f"    #    {cnv_err.msg}", file=outfile)
+                lines.append(f"    # version {v!s}:")
+                lines.extend(f"    #    {cnv_err.msg}" for cnv_err in cnv_errs)
 
-            print("", file=outfile)
+            lines.append("")
 
         if self.dependency_conflict_errors:
             txt = """\
     # FIXME: the following dependency conflicts were found. A conflict arises if two dependencies
     # have intersecting 'when=...' Specs (meaning that they can both be required at the same time),
     # but non-intersecting dependency Specs (e.g. 'pkg@4.2:' and 'pkg@:3.5')"""
-            print(txt, file=outfile)
-
-            for dep_conflict in self.dependency_conflict_errors:
-                print(f"    # {dep_conflict.msg}", file=outfile)
-
-            print("", file=outfile)
-
-        def _requirement_sort_key(
-            req: tuple[spec.Spec, spec.Spec],
-        ) -> tuple[int, int, str, sv.VersionList, str]:
-            """Helper function for sorting requirements in the package.py.
-
-            Dependencies are sorted in the package.py according to is_python,
-            has_variant, pkg_name, pkg_version_list, variant string, in that order.
-            """
-            dep, when = req
-            # != because we want python to come first
-            is_python = int(dep.name != "python")
-            has_variant = int(len(str(when.variants)) > 0)
-            pkg_name = dep.name
-            pkg_version = dep.versions
-            variant = str(when.variants)
-            return (is_python, has_variant, pkg_name, pkg_version, variant)
-
-        for dep_type in list(self._dependencies_by_type.keys()):
-            dependencies = self._dependencies_by_type[dep_type]
+            lines.append(txt)
+
+            lines.extend(
+                f"    # {dep_conflict.msg}" for dep_conflict in self.dependency_conflict_errors
+            )
+
+            lines.append("")
+
+        for dep_type, dependencies in self._dependencies_by_type.items():
             sorted_dependencies = sorted(dependencies, key=_requirement_sort_key)
 
-            print(f"    with default_args(type={dep_type}):", file=outfile)
-            for dep_spec, when_spec in sorted_dependencies:
-                print(
-                    "        " + _format_dependency(dep_spec, when_spec),
-                    file=outfile,
-                )
+            lines.append(f"    with default_args(type={dep_type}):")
+            lines.extend(
+                f"        {_format_dependency(dep_spec, when_spec)}"
+                for dep_spec, when_spec in sorted_dependencies
+            )
 
-            print("", file=outfile)
+            lines.append("")
 
         # Handle dependencies from CMakeLists.txt for scikit-build-core
         # only print as comments
         if self._cmake_dependencies_with_sources:
-            print(
+            lines.append(
                 "\n    # FIXME: The package might have non-python dependencies. The dependencies"
-                " below have been extracted from included CMakeLists.txt files.",
-                file=outfile,
+                " below have been extracted from included CMakeLists.txt files."
             )
-            print(
-                "    # Please correct and review them manually, and add the ones that are required.",
-                file=outfile,
+            lines.append(
+                "    # Please correct and review them manually, and add the ones that are required."
             )
-            print(
+            lines.append(
                 "    # NOTE: These dependencies have only been extracted from the MOST RECENT package"
                 " version included in this Spack recipe.\n    # Extend these dependencies manually to "
-                "explicitly support older versions.\n",
-                file=outfile,
+                "explicitly support older versions.\n"
             )
 
             for dep_name, dep_list in self._cmake_dependencies_with_sources.items():
@@ -781,24 +825,24 @@ class SpackPyPkg:
                 main_spec = (
                     next(iter(unique_specs)) if len(unique_specs) == 1 else spec.Spec(dep_name)
                 )
-                print(
-                    "        # " + _format_dependency(main_spec, spec.Spec()),
-                    file=outfile,
-                )
+                lines.append("        # " + _format_dependency(main_spec, spec.Spec()))
                 for current_spec, source_info in dep_list:
                     current_spec_str = "" if current_spec == main_spec else f"({current_spec})"
 
-                    print(
-                        f"        #   {source_info[0]}, line {source_info[1]} {current_spec_str}",
-                        file=outfile,
+                    lines.append(
+                        f"        #   {source_info[0]}, line {source_info[1]} {current_spec_str}"
                     )
-                print("", file=outfile)
+                lines.append("")
 
-        print("", file=outfile)
+        lines.append("")
+
+        outfile.write("\n".join(lines) + "\n")
 
 
 def _load_cmakelists_for_pyproject(
-    pyproject: PyProject, provider: package_providers.PackageProvider
+    pyproject: PyProject,
+    provider: package_providers.PackageProvider,
+    jobs: int = package_providers.MAX_CONCURRENT_REQUESTS,
 ) -> None:
     """Load and parse the CMakeLists.txt files for a given PyProject/version.
 
@@ -808,37 +852,19 @@ def _load_cmakelists_for_pyproject(
     file, all 'cmake_minimum_required' and 'find_package' statements are converted
     to Spack dependency Specs.
     """
-    subdirectory_queue = [pathlib.Path()]
-    visited_subdirectories = []
-    while subdirectory_queue:
-        current_subdir = subdirectory_queue.pop(0)
-        file_path = current_subdir / "CMakeLists.txt"
-
-        visited_subdirectories.append(current_subdir)
 
+    def _read_cmakelists(file_path: pathlib.Path) -> str | None:
         cmakelists_data = provider.get_file_content_from_sdist(
             pyproject.name, pyproject.version, file_path
         )
+        return cmakelists_data if isinstance(cmakelists_data, str) else None
 
-        if isinstance(cmakelists_data, str):
-            dependencies, new_subdirs = cmake_conversion.convert_cmake_dependencies(cmakelists_data)
+    dependencies = cmake_conversion.convert_cmake_tree(_read_cmakelists, max_workers=jobs)
 
-            for dep, line_nr in dependencies:
-                if dep.name not in pyproject.cmake_dependencies_with_sources:
-                    pyproject.cmake_dependencies_with_sources[dep.name] = []
-                pyproject.cmake_dependencies_with_sources[dep.name].append(
-                    (dep, (file_path, line_nr))
-                )
-
-            for relative_subdir_path in new_subdirs:
-                subdir_path = current_subdir / relative_subdir_path
-                subdir_path = utils.normalize_path(subdir_path)
-
-                if (
-                    subdir_path not in subdirectory_queue
-                    and subdir_path not in visited_subdirectories
-                ):
-                    subdirectory_queue.append(subdir_path)
+    for dep, file_path, line_nr in dependencies:
+        if dep.name not in pyproject.cmake_dependencies_with_sources:
+            pyproject.cmake_dependencies_with_sources[dep.name] = []
+        pyproject.cmake_dependencies_with_sources[dep.name].append((dep, (file_path, line_nr)))
 
 
 def _load_pyprojects(
@@ -846,20 +872,25 @@ def _load_pyprojects(
     version_list: list[pv.Version],
     num_versions: int,
     provider: package_providers.PackageProvider,
+    jobs: int = package_providers.MAX_CONCURRENT_REQUESTS,
 ) -> list[PyProject]:
     """Given a list of versions, download and parse the corresponding pyprojects.
 
-    For scikit-build-core packages, also downloads and parses the CMakeLists.txt
-    files for the most recent package version.
+    The pyproject.toml files are downloaded in parallel (using `jobs` threads), but
+    parsed in order. For scikit-build-core packages, also downloads and parses the
+    CMakeLists.txt files for the most recent package version.
     """
+    # only look at the `num_versions` most recent versions
+    versions = list(reversed(version_list))[:num_versions]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pyproject_dicts = list(
+            executor.map(functools.partial(provider.get_pyproject, name), versions)
+        )
+
     # for each version, parse pyproject.toml
     pyprojects: list[PyProject] = []
-    for i, v in enumerate(reversed(version_list)):
-        # only look at the first `num_versions` versions
-        if i == num_versions:
-            break
-
-        pyproject_dict = provider.get_pyproject(name, v)
+    for v, pyproject_dict in zip(versions, pyproject_dicts, strict=True):
         if isinstance(pyproject_dict, package_providers.PackageProviderQueryError):
             logging.warning(
                 "Unable to get pyproject.toml for %s version %s: %s",
@@ -886,7 +917,7 @@ def _load_pyprojects(
     # go through simplification process with cmake versions
 
     if pyprojects and pyprojects[0].build_backend == "scikit_build_core.build":
-        _load_cmakelists_for_pyproject(pyprojects[0], provider)
+        _load_cmakelists_for_pyproject(pyprojects[0], provider, jobs)
 
     return pyprojects
 
@@ -895,7 +926,9 @@ def _convert_single(
     name: str,
     pypi_provider: package_providers.PyPIProvider,
     gh_provider: package_providers.GitHubProvider,
+    *,
     num_versions: int = 10,
+    jobs: int = package_providers.MAX_CONCURRENT_REQUESTS,
 ) -> SpackPyPkg | None:
     """Convert a standard Python package to a Spack package.py.
 
@@ -907,15 +940,18 @@ def _convert_single(
             through the PyPI Package Provider.
         num_versions: Number of versions that should be downloaded and used to build
             the package dependencies.
+        jobs: Maximum number of concurrent downloads.
 
     Returns:
         The converted SpackPyPkg, or None.
     """
     # go through providers to check if one of them has the package
-    is_gh_package = gh_provider.package_exists(name)
-    provider = gh_provider if is_gh_package else pypi_provider
-
-    if not provider.package_exists(name):
+    provider: package_providers.PackageProvider
+    if gh_provider.package_exists(name):
+        provider = gh_provider
+    elif pypi_provider.package_exists(name):
+        provider = pypi_provider
+    else:
         logging.warning("Package %s not found through any of the supplied providers", name)
         return None
 
@@ -925,7 +961,7 @@ def _convert_single(
         logging.warning("No valid versions found by provider %s", str(provider))
         return None
 
-    pyprojects = _load_pyprojects(name, versions, num_versions, provider)
+    pyprojects = _load_pyprojects(name, versions, num_versions, provider, jobs)
 
     if not pyprojects:
         logging.warning("Conversion for %s failed, no valid pyproject.tomls found", name)
@@ -956,15 +992,16 @@ def _write_package_to_repo(package: SpackPyPkg, spack_repo: pathlib.Path) -> boo
     """Save the package to the repo in a dedicated subdirectory and package.py file."""
     if not spack_repo.is_dir():
         return False
+
+    # format the package before creating any files, and write it in a single call
+    buffer = io.StringIO()
+    package.print_pkg(outfile=buffer)
+
     try:
         pkg_dir = spack_repo / "packages" / package.name
         pkg_dir.mkdir()
 
-        package_py = pkg_dir / "package.py"
-        package_py.touch()
-
-        with package_py.open("w") as f:
-            package.print_pkg(outfile=f)
+        (pkg_dir / "package.py").write_text(buffer.getvalue(), encoding="utf-8")
 
         return True
 
@@ -972,6 +1009,80 @@ def _write_package_to_repo(package: SpackPyPkg, spack_repo: pathlib.Path) -> boo
         return False
 
 
+@dataclasses.dataclass
+class _ConversionState:
+    """Bookkeeping of the packages converted (or to be converted) by convert_package."""
+
+    # packages which are not converted as dependencies
+    ignored: set[str]
+    # queue of packages to be converted
+    queue: collections.deque[str] = dataclasses.field(default_factory=collections.deque)
+    # all packages that were ever added to the queue (converted, failed, in progress)
+    enqueued: set[str] = dataclasses.field(default_factory=set)
+    # converted packages with number of converted versions. these can still have
+    # errors, FIXME's, etc.
+    converted: list[tuple[str, int, bool]] = dataclasses.field(default_factory=list)
+    # packages that could not be converted and written at all
+    conversion_failures: list[str] = dataclasses.field(default_factory=list)
+    # missing non-python dependencies
+    missing_non_python_deps: set[str] = dataclasses.field(default_factory=set)
+    # Spack names of the packages written to the repo in this run, these are not
+    # detected by the (cached) spack_utils.package_exists_in_spack
+    written: set[str] = dataclasses.field(default_factory=set)
+
+    def add_result(
+        self,
+        name: str,
+        future: concurrent.futures.Future[SpackPyPkg | None],
+        spack_repo: pathlib.Path,
+    ) -> None:
+        """Write a finished conversion to the repo and enqueue its dependencies."""
+        try:
+            spackpkg = future.result()
+        except Exception:
+            # an unexpected error only fails the current package, keep the traceback
+            logging.exception("Error when converting package %s", name)
+            spackpkg = None
+
+        if spackpkg is None:
+            self.conversion_failures.append(name)
+            return
+
+        # write package to repo
+        if not _write_package_to_repo(spackpkg, spack_repo):
+            logging.warning("Error when trying to write package %s to repository", name)
+            self.conversion_failures.append(name)
+            return
+
+        self.written.add(spackpkg.name)
+
+        # store package name, number of converted versions, and whether there are
+        # requried fixes for dependencies
+        dep_requires_fix = (
+            bool(spackpkg.dependency_parse_errors)
+            or bool(spackpkg.dependency_conversion_errors)
+            or bool(spackpkg.dependency_conflict_errors)
+            or bool(spackpkg.cmake_dependency_names)
+        )
+        self.converted.append((name, spackpkg.num_converted_versions, dep_requires_fix))
+
+        for dep in spackpkg.original_dependencies:
+            spack_name = conversion_tools.pkg_to_spack_name(dep)
+            if (
+                dep != "python"
+                and dep not in self.enqueued
+                and dep not in self.ignored
+                and spack_name not in self.written
+                and not spack_utils.package_exists_in_spack(spack_name)
+            ):
+                self.queue.append(dep)
+                self.enqueued.add(dep)
+
+        for dep in spackpkg.cmake_dependency_names:
+            if not spack_utils.package_exists_in_spack(dep) and dep not in self.ignored:
+                self.missing_non_python_deps.add(dep)
+
+
 # TODO @davhofer: allow multiple providers/user specification/check a list of providers for package
 # TODO @davhofer: some sort of progress bar/console output while converting, downloading archives, etc.
 # TODO @davhofer: currently, dependencies for variants/optional dependencies are also converted. Make this optional? Add flag to disable conversion of optional/extra dependencies. Map dependency name -> is_optional boolean flag
@@ -982,6 +1093,7 @@ def convert_package(  # noqa: PLR0913 [too many arguments in function defintion]
     repo: str | None = None,
     ignore: list[str] | None = None,
     allow_duplicate: bool = False,
+    jobs: int | None = None,
 ) -> None:
     """Convert a package and its dependencies to Spack.
 
@@ -999,11 +1111,17 @@ def convert_package(  # noqa: PLR0913 [too many arguments in function defintion]
             already exists in some Spack repo. This will NOT overwrite the existing
             package. Only applies to the main package to be converted, not to
             dependencies.
+        jobs: Maximum number of concurrent downloads over all packages, which also
+            limits the number of packages converted concurrently, by default
+            package_providers.MAX_CONCURRENT_REQUESTS.
 
     Returns:
         None, packages are directly written to the repo.
     """
-    ignore_list: list[str] = [] if ignore is None else ignore
+    if jobs is None:
+        jobs = package_providers.MAX_CONCURRENT_REQUESTS
+    # bound the number of concurrent requests over all conversions
+    utils.limit_concurrent_requests(jobs)
 
     spack_repo = spack_utils.get_spack_repo(repo)
 
@@ -1025,76 +1143,67 @@ def convert_package(  # noqa: PLR0913 [too many arguments in function defintion]
         print(f"Package {spack_name} already exists in Spack")
         return
 
-    # queue of packages to be converted
-    queue: list[str] = [name]
-    # converted packages with number of converted versions. these can still have
-    # errors, FIXME's, etc.
-    converted: list[tuple[str, int, bool]] = []
-    # packages that could not be converted and written at all
-    conversion_failures: list[str] = []
-    # missing non-python dependencies
-    missing_non_python_deps: set[str] = set()
+    state = _ConversionState(ignored=set() if ignore is None else set(ignore))
+    state.queue.append(name)
+    state.enqueued.add(name)
+
+    max_workers = min(MAX_CONCURRENT_CONVERSIONS, jobs)
+    if max_conversions != -1:
+        max_workers = max(1, min(max_workers, max_conversions))
+    # conversions run in worker threads, writing the packages to the repo and
+    # enqueueing new dependencies is done in the main thread only
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    in_flight: dict[concurrent.futures.Future[SpackPyPkg | None], str] = {}
 
     # allow user to cancel (Ctrl+C) the process and still show summary
     try:
-        while queue and (max_conversions == -1 or len(converted) < max_conversions):
-            name = queue.pop()
+        while state.queue or in_flight:
+            while state.queue and (
+                max_conversions == -1 or len(state.converted) + len(in_flight) < max_conversions
+            ):
+                name = state.queue.popleft()
+                print(f"\nConverting package {name}...")
+                future = executor.submit(
+                    _convert_single,
+                    name,
+                    pypi_provider,
+                    gh_provider,
+                    num_versions=versions_per_package,
+                    jobs=jobs,
+                )
+                in_flight[future] = name
 
-            print(f"\nConverting package {name}...")
-            spackpkg = _convert_single(
-                name,
-                pypi_provider,
-                gh_provider,
-                num_versions=versions_per_package,
-            )
+            if not in_flight:
+                # max_conversions limit reached
+                break
 
-            if spackpkg is None:
-                conversion_failures.append(name)
-                continue
-
-            # write package to repo
-            write_successful = _write_package_to_repo(spackpkg, spack_repo)
-
-            if not write_successful:
-                logging.warning("Error when trying to write package %s to repository", name)
-                conversion_failures.append(name)
-                continue
-
-            # store package name, number of converted versions, and whether there are
-            # requried fixes for dependencies
-            dep_requires_fix = (
-                bool(spackpkg.dependency_parse_errors)
-                or bool(spackpkg.dependency_conversion_errors)
-                or bool(spackpkg.dependency_conflict_errors)
-                or bool(spackpkg.cmake_dependency_names)
+            done, _ = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED
             )
-            converted.append((name, spackpkg.num_converted_versions, dep_requires_fix))
-
-            for dep in spackpkg.original_dependencies:
-                spack_name = conversion_tools.pkg_to_spack_name(dep)
-                if (
-                    dep != "python"
-                    and dep not in queue
-                    and dep not in conversion_failures
-                    and dep not in ignore_list
-                    and not spack_utils.package_exists_in_spack(
-                        spack_name
-                    )  # this also covers packages already converted in this run
-                ):
-                    queue.append(dep)
-
-            for dep in spackpkg.cmake_dependency_names:
-                if not spack_utils.package_exists_in_spack(dep) and dep not in ignore_list:
-                    missing_non_python_deps.add(dep)
+            for future in done:
+                state.add_result(in_flight.pop(future), future, spack_repo)
 
     except KeyboardInterrupt:
-        # display the current package in summary
-        queue.insert(0, name)
-
-    _print_summary(converted, queue, conversion_failures, missing_non_python_deps)
+        # let the running conversions fail at their next request and wait for them,
+        # such that they don't log into the summary. Their results are discarded,
+        # they are displayed as unconverted in the summary
+        utils.cancel_requests()
+        executor.shutdown(wait=True, cancel_futures=True)
+        state.queue.extendleft(in_flight.values())
+
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        utils.resume_requests()
+
+    _print_summary(
+        state.converted,
+        list(state.queue),
+        state.conversion_failures,
+        state.missing_non_python_deps,
+    )
 
 
-def _print_summary(  # noqa: PLR0912 [too many branches]
+def _print_summary(
     converted: list[tuple[str, int, bool]],
     queue: list[str],
     conversion_failures: list[str],
@@ -1104,60 +1213,62 @@ def _print_summary(  # noqa: PLR0912 [too many branches]
     if "pythoninterp" in missing_non_python_deps:
         missing_non_python_deps.remove("pythoninterp")
 
-    print(
-        "\n\nNOTE: converted packages are saved in the Spack repo with the prefix 'py-' (e.g. 'py-pandas' instead of 'pandas')."
-    )
-    print("\n\n * * * * * * * * * * * * * SUMMARY * * * * * * * * * * * * *\n *")
+    separator = " *   -   -   -   -   -   -   -   -   -   -   -   -   -   -  \n *"
 
-    print(f" * Converted {len(converted)} packages:")
+    lines: list[str] = [
+        "\n\nNOTE: converted packages are saved in the Spack repo with the prefix 'py-' (e.g. 'py-pandas' instead of 'pandas').",
+        "\n\n * * * * * * * * * * * * * SUMMARY * * * * * * * * * * * * *\n *",
+    ]
+
+    lines.append(f" * Converted {len(converted)} packages:")
     has_fix_dep = False
     for p, n_versions, dep_requires_fix in converted:
         if dep_requires_fix:
             has_fix_dep = True
-        print(f" *  - {p} ({n_versions} versions) {'[FIX DEP.]' if dep_requires_fix else ''}")
+        lines.append(
+            f" *  - {p} ({n_versions} versions) {'[FIX DEP.]' if dep_requires_fix else ''}"
+        )
     # only display this if a package has the FIX DEP flag
     if has_fix_dep:
-        print(
+        lines.append(
             " *\n * Dependencies (& errors) that require manual review are\n * marked as [FIX DEP.]. See generated `package.py` for\n * details."
         )
 
-    print(" *")
-    print(" *   -   -   -   -   -   -   -   -   -   -   -   -   -   -  \n *")
+    lines.extend((" *", separator))
     if queue:
-        print(
+        lines.append(
             f" * `max_conversions` limit reached but {len(queue)} unconverted\n * dependency packages left:"
         )
-        for p in queue:
-            print(f" *  - {p}")
+        lines.extend(f" *  - {p}" for p in queue)
 
     else:
-        print(" * No packages left.")
+        lines.append(" * No packages left.")
 
-    print(" *")
-    print(" *   -   -   -   -   -   -   -   -   -   -   -   -   -   -  \n *")
+    lines.extend((" *", separator))
     if conversion_failures:
-        print(
+        lines.append(
             f" * The following {len(conversion_failures)} packages could not be converted\n * due to errors:"
         )
-        for p in conversion_failures:
-            print(f" *  - {p}")
+        lines.extend(f" *  - {p}" for p in conversion_failures)
 
     else:
-        print(" * No conversion failures.")
+        lines.append(" * No conversion failures.")
 
-    print(" *")
+    lines.append(" *")
     if missing_non_python_deps:
-        print(" *   -   -   -   -   -   -   -   -   -   -   -   -   -   -  \n *")
-        print(
+        lines.append(separator)
+        lines.append(
             f" * The following {len(missing_non_python_deps)} packages are external/non-\n * python dependencies but are missing in Spack. If \n * required, please make sure they are available"
         )
-        for p in missing_non_python_deps:
-            print(f" *  - {p}")
-        print(" *")
+        lines.extend(f" *  - {p}" for p in missing_non_python_deps)
+        lines.append(" *")
 
     if converted:
-        print(" *   -   -   -   -   -   -   -   -   -   -   -   -   -   -  \n *")
-        print(" *\n * All generated `package.py` files should be manually\n * reviewed.")
-        print(" *")
+        lines.append(separator)
+        lines.append(" *\n * All generated `package.py` files should be manually\n * reviewed.")
+        lines.append(" *")
+
+    lines.append(" *\n * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *")
 
-    print(" *\n * * * * * * * * * * * * * * * * * * * * * * * * * * * * * *")
+    # write the whole summary at once
+    sys.stdout.write("\n".join(lines) + "\n")
@@ -3,21 +3,27 @@
 from __future__ import annotations
 
 import abc
+import concurrent.futures
 import dataclasses
 import functools
 import hashlib
 import pathlib
 import re
-from collections.abc import Hashable
+import sys
+from collections.abc import Hashable, Iterable
 from typing import Protocol
 
-import requests
-import tomli
 from packaging import version as vn
 
 from py2spack import utils
 
 
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
 TARBALL_ARCHIVE_FORMATS = [
     ".tar",
     ".tar.gz",
@@ -27,9 +33,26 @@ TARBALL_ARCHIVE_FORMATS = [
     ".bz2",
 ]
 
+# archive extensions sorted longest-first, so the first match is the most specific one
+# (e.g. ".tar.gz" instead of ".gz")
+_ARCHIVE_EXTENSIONS_BY_LENGTH = tuple(sorted(TARBALL_ARCHIVE_FORMATS, key=len, reverse=True))
+
+# runs of separators which are normalized to a single "-" in package names (PEP 503)
+NAME_SEPARATORS_REGEX = re.compile(r"[-_.]+")
+
+# GitHub repository url, with optional .git suffix and trailing slash
+GITHUB_REPO_URL_REGEX = re.compile(r"https://github\.com/([^/]*/[^/]*?)(?:\.git)?/?")
+
+# number of concurrent requests when prefetching data for multiple packages
+MAX_CONCURRENT_REQUESTS = 16
+
 
+@functools.lru_cache(maxsize=8192)
 def _parse_packaging_version(version: str) -> vn.Version | None:
-    """Parse packaging version."""
+    """Parse packaging version.
+
+    Results are cached, as the same version strings are parsed for every lookup.
+    """
     result = None
     try:
         v = vn.parse(version)
@@ -100,7 +123,9 @@ class GitHubProvider(PackageProvider):
             f"{self.base_url}{'' if self.base_url.endswith('/') else '/'}{repo_specifier}/releases"
         )
 
-        r = requests.get(url, headers={"accept": "application/vnd.github+json"}, timeout=10)
+        r = utils.get_session().get(
+            url, headers={"accept": "application/vnd.github+json"}, timeout=10
+        )
 
         if r.status_code != utils.HTTP_STATUS_SUCCESS:
             if r.status_code == utils.HTTP_STATUS_NOT_FOUND:
@@ -149,20 +174,8 @@ class GitHubProvider(PackageProvider):
         if len(name.split("/")) == 2:  # noqa: PLR2004 [magic value]
             return name
 
-        github_url = "https://github.com/"
-        if name.startswith(github_url):
-            if name.endswith("/"):
-                name = name[:-1]
-            # remove base url
-            repo_specifier = name[len(github_url) :]
-            # if .git suffix exists, remove it
-            if repo_specifier.endswith(".git"):
-                repo_specifier = repo_specifier[:-4]
-            # check formatting
-            if len(repo_specifier.split("/")) == 2:  # noqa: PLR2004 [magic value]
-                return repo_specifier
-
-        return None
+        match = GITHUB_REPO_URL_REGEX.fullmatch(name)
+        return match.group(1) if match else None
 
     def get_download_url(
         self, name: str, version: vn.Version | None = None
@@ -273,9 +286,9 @@ class GitHubProvider(PackageProvider):
             return file_content
 
         try:
-            return tomli.loads(file_content)
+            return tomllib.loads(file_content)
 
-        except tomli.TOMLDecodeError:
+        except tomllib.TOMLDecodeError:
             return PackageProviderQueryError(
                 "Unable to parse contents of pyproject.toml as valid toml data."
             )
@@ -309,20 +322,50 @@ class PyPIProvider(PackageProvider):
     """
 
     base_url: str = "https://pypi.org/simple/"
+    # directory for persistently caching API responses across runs, None to disable
+    cache_dir: pathlib.Path | None = dataclasses.field(
+        default_factory=lambda: utils.get_cache_dir() / "pypi"
+    )
 
     @functools.cache  # noqa: B019
     def _get(self, name: str) -> dict | PackageProviderQueryError:
         """Load info for the available distribution files from PyPI.
 
-        Data is cached.
+        Data is cached in memory, and successful responses are also cached on disk
+        (if `cache_dir` is set). Recent disk cache entries are used directly, older
+        ones are revalidated with PyPI through their ETag.
         """
         name = _normalize_package_name(name)
         url = f"{self.base_url}{'' if self.base_url.endswith('/') else '/'}{name}/"
-        r = requests.get(
-            url,
-            headers={"Accept": "application/vnd.pypi.simple.v1+json"},
-            timeout=10,
-        )
+
+        headers = {"Accept": "application/vnd.pypi.simple.v1+json"}
+
+        cache_file = None
+        cached = None
+        if self.cache_dir is not None:
+            # separate the entries of different indexes (e.g. mirrors, test.pypi.org)
+            cache_file = self.cache_dir / _url_cache_key(self.base_url) / f"{name}.json"
+            cached = utils.load_json_cache(cache_file)
+            if not (isinstance(cached, dict) and "etag" in cached and "data" in cached):
+                cached = None
+            elif utils.is_cache_file_fresh(cache_file):
+                cached_data: dict = cached["data"]
+                return cached_data
+            else:
+                headers["If-None-Match"] = cached["etag"]
+
+        r = utils.get_session().get(url, headers=headers, timeout=10)
+
+        if (
+            r.status_code == utils.HTTP_STATUS_NOT_MODIFIED
+            and cache_file is not None
+            and cached is not None
+        ):
+            # still up to date, reset the age of the cache entry
+            utils.save_json_cache(cache_file, cached)
+            revalidated_data: dict = cached["data"]
+            return revalidated_data
+
         if r.status_code != utils.HTTP_STATUS_SUCCESS:
             if r.status_code == utils.HTTP_STATUS_NOT_FOUND:
                 return PackageProviderQueryError(
@@ -335,6 +378,11 @@ class PyPIProvider(PackageProvider):
             )
 
         data: dict = r.json()
+
+        etag = r.headers.get("ETag")
+        if cache_file is not None and etag:
+            utils.save_json_cache(cache_file, {"etag": etag, "data": data})
+
         return data
 
     def package_exists(self, name: str) -> bool:
@@ -345,7 +393,6 @@ class PyPIProvider(PackageProvider):
             and response.msg.endswith("(status code 404)")
         )
 
-    @functools.cache  # noqa: B019
     def get_versions(self, name: str) -> list[vn.Version] | PackageProviderQueryError:
         """Get usable versions for package.
 
@@ -353,7 +400,13 @@ class PyPIProvider(PackageProvider):
         In addition to the caching of the `_get` method, we also cache all calls
         to `get_versions`, because the versions are needed frequently during the
         conversion process for dependencies, and the size of the data is small.
+        Different spellings of the same name (e.g. 'Foo_Bar' and 'foo-bar') share
+        one cache entry.
         """
+        return self._get_versions(_normalize_package_name(name))
+
+    @functools.cache  # noqa: B019
+    def _get_versions(self, name: str) -> list[vn.Version] | PackageProviderQueryError:
         data = self._get(name)
         if isinstance(data, PackageProviderQueryError):
             return data
@@ -370,10 +423,34 @@ class PyPIProvider(PackageProvider):
 
         return result
 
+    def prefetch_versions(self, names: Iterable[str]) -> None:
+        """Concurrently query the versions of multiple packages.
+
+        The results are stored in the cache of `get_versions`, such that subsequent
+        lookups (e.g. while converting the dependencies of a package) do not have to
+        wait for a separate request to PyPI each. Names are normalized first, such
+        that each package is only requested once.
+        """
+        unique_names = {_normalize_package_name(name) for name in names}
+        if not unique_names:
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(MAX_CONCURRENT_REQUESTS, len(unique_names))
+        ) as executor:
+            # errors are cached and handled by the caller on lookup
+            list(executor.map(self._get_versions, unique_names))
+
     def get_file_content_from_sdist(
         self, name: str, version: vn.Version, file_path: pathlib.Path
     ) -> str | PackageProviderQueryError:
-        """Download source distribution and extract file content."""
+        """Download source distribution and extract file content.
+
+        Extracted files are cached on disk (if `cache_dir` is set), keyed by the
+        sha256 of the sdist and the file path, so the same archive is never
+        downloaded twice. Each file has its own cache entry, such that files of the
+        same sdist can be extracted concurrently.
+        """
         all_metadata = self._get_distribution_metadata(name)
 
         if isinstance(all_metadata, PackageProviderQueryError):
@@ -388,6 +465,14 @@ class PyPIProvider(PackageProvider):
         assert isinstance(metadata["url"], str)
         assert isinstance(metadata["extension"], str)
 
+        # sdists are immutable on PyPI, so cache entries never have to be revalidated
+        sdist_cache_file = self._sdist_cache_file(metadata, file_path)
+        cached_content = (
+            utils.load_json_cache(sdist_cache_file) if sdist_cache_file is not None else None
+        )
+        if isinstance(cached_content, str):
+            return cached_content
+
         archive_ext = metadata["extension"]
         sdist_file_obj = utils.download_bytes(metadata["url"])
 
@@ -412,8 +497,25 @@ class PyPIProvider(PackageProvider):
                 "Failed to open sdist, format must be tarball archive (.tar.gz, .bz2, etc.)"
             )
 
+        if isinstance(result, str) and sdist_cache_file is not None:
+            utils.save_json_cache(sdist_cache_file, result)
+
         return result
 
+    def _sdist_cache_file(
+        self, metadata: dict[str, str | dict], file_path: pathlib.Path
+    ) -> pathlib.Path | None:
+        """Get the disk cache file for a file in the sdist described by 'metadata'.
+
+        Returns None if caching is disabled or the sdist has no sha256 hash.
+        """
+        hashes = metadata["hashes"]
+        sha256 = hashes.get("sha256") if isinstance(hashes, dict) else None
+        if self.cache_dir is None or not isinstance(sha256, str):
+            return None
+        path_digest = hashlib.sha256(str(file_path).encode()).hexdigest()[:16]
+        return self.cache_dir / "sdist" / sha256 / f"{path_digest}.json"
+
     def get_pyproject(self, name: str, version: vn.Version) -> dict | PackageProviderQueryError:
         """Download and extract the pyproject.toml for the specified package version."""
         file_content = self.get_file_content_from_sdist(
@@ -423,9 +525,9 @@ class PyPIProvider(PackageProvider):
             return file_content
 
         try:
-            return tomli.loads(file_content)
+            return tomllib.loads(file_content)
 
-        except tomli.TOMLDecodeError:
+        except tomllib.TOMLDecodeError:
             return PackageProviderQueryError(
                 "Unable to parse contents of pyproject.toml as valid toml data."
             )
@@ -448,22 +550,22 @@ class PyPIProvider(PackageProvider):
             return data
         files = data["files"]
 
-        # for now we only support tarball archives like .tar.gz
-        files_known_format = [f for f in files if _is_archive_format_known(f["filename"])]
-
-        if not files_known_format:
-            return PackageProviderQueryError(
-                "No files with known archive format found (note: wheel file"
-                " parsing not supported)"
-            )
-
         # for each file, get the filename, url, version, extension, and sha256
+        # (in a single pass over the potentially long list of files)
         # TODO @davhofer: in case of an error, skip the file or return the error?
         files_parsed: dict[vn.Version, dict[str, str | dict]] = {}
-        for f in files_known_format:
+        has_known_format = False
+        for f in files:
             filename = f["filename"]
+
+            # for now we only support tarball archives like .tar.gz. Most files are
+            # wheels, skip them before building an error for the unknown extension
+            if not filename.endswith(_ARCHIVE_EXTENSIONS_BY_LENGTH):
+                continue
             archive_ext = _parse_archive_extension(filename)
-            assert isinstance(archive_ext, str)
+            if isinstance(archive_ext, PackageProviderQueryError):
+                continue
+            has_known_format = True
 
             directory_name = filename[: -len(archive_ext)]
 
@@ -487,6 +589,12 @@ class PyPIProvider(PackageProvider):
                 "directory": directory_name,
             }
 
+        if not has_known_format:
+            return PackageProviderQueryError(
+                "No files with known archive format found (note: wheel file"
+                " parsing not supported)"
+            )
+
         if not files_parsed:
             return PackageProviderQueryError("No valid files found")
 
@@ -551,24 +659,24 @@ class PyPIProvider(PackageProvider):
             return None
 
 
+@functools.lru_cache(maxsize=4096)
 def _normalize_package_name(name: str) -> str:
-    return re.sub(r"[-_.]+", "-", name).lower()
+    return NAME_SEPARATORS_REGEX.sub("-", name).lower()
 
 
-def _parse_archive_extension(filename: str) -> str | PackageProviderQueryError:
-    extension_list = [ext for ext in TARBALL_ARCHIVE_FORMATS if filename.endswith(ext)]
-
-    if not extension_list:
-        # we return an API error here because the filenames are obtained through
-        # the API and the function is used during the API lookup process
-        return PackageProviderQueryError(f"Extension not recognized for: {filename}")
+def _url_cache_key(url: str) -> str:
+    """Get a short digest of a url, for use in cache file paths."""
+    return hashlib.sha256(url.encode()).hexdigest()[:16]
 
-    # get the longest matching extension, e.g. .tar.gz instead of .gz
-    return max(extension_list, key=len)
 
+def _parse_archive_extension(filename: str) -> str | PackageProviderQueryError:
+    for ext in _ARCHIVE_EXTENSIONS_BY_LENGTH:
+        if filename.endswith(ext):
+            return ext
 
-def _is_archive_format_known(filename: str) -> bool:
-    return any(filename.endswith(ext) for ext in TARBALL_ARCHIVE_FORMATS)
+    # we return an API error here because the filenames are obtained through
+    # the API and the function is used during the API lookup process
+    return PackageProviderQueryError(f"Extension not recognized for: {filename}")
 
 
 # TODO @davhofer: handle zip archives
@@ -7,6 +7,7 @@ Parts of the code adapted from https://github.com/pypa/pyproject-metadata.
 from __future__ import annotations
 
 import dataclasses
+import functools
 import re
 from typing import Any
 
@@ -15,6 +16,9 @@ from packaging import requirements, specifiers
 
 LICENSE_IDENTIFIER_LEN = 250
 
+# valid project names according to PEP 508
+PYPI_NAME_REGEX = re.compile(r"[A-Z0-9]|[A-Z0-9][A-Z0-9._-]*[A-Z0-9]", re.IGNORECASE)
+
 
 @dataclasses.dataclass(frozen=True)
 class ConfigurationError:
@@ -33,6 +37,19 @@ def _validate_license_txt(license_text: str) -> str | ConfigurationError:
     return license_text
 
 
+@functools.lru_cache(maxsize=4096)
+def _parse_requirement(req: str) -> requirements.Requirement:
+    """Parse a PEP 508 requirement string.
+
+    The same requirements appear in the pyproject.toml files of many versions, so
+    parsed requirements are cached and shared. They must not be modified.
+
+    Raises:
+        requirements.InvalidRequirement: if the string is not a valid requirement.
+    """
+    return requirements.Requirement(req)
+
+
 class DataFetcher:
     """Fetcher class for parsing and extracting the various metadata fields."""
 
@@ -158,7 +175,7 @@ class DataFetcher:
             # TODO @davhofer: the requirements here of course SHOULD be formatted correctly...
             # but what if they are not
             try:
-                requirements_list.append(requirements.Requirement(req))
+                requirements_list.append(_parse_requirement(req))
             except requirements.InvalidRequirement:  # noqa: PERF203
                 requirement_errors.append(
                     ConfigurationError(
@@ -226,7 +243,7 @@ class DataFetcher:
                     )
                     continue
                 try:
-                    requirements_dict[extra].append(requirements.Requirement(req))
+                    requirements_dict[extra].append(_parse_requirement(req))
                 except requirements.InvalidRequirement:
                     requirement_errors.append(
                         ConfigurationError(
@@ -326,7 +343,7 @@ class DataFetcher:
         requirement_errors: list[ConfigurationError] = []
         for req in requirement_strings:
             try:
-                requirements_list.append(requirements.Requirement(req))
+                requirements_list.append(_parse_requirement(req))
             except requirements.InvalidRequirement as e:  # noqa: PERF203
                 requirement_errors.append(
                     ConfigurationError(
@@ -357,4 +374,4 @@ class DataFetcher:
 
 def valid_pypi_name(name: str) -> bool:
     """Checks whether 'name' is a valid pypi name."""
-    return re.match(r"^([A-Z0-9]|[A-Z0-9][A-Z0-9._-]*[A-Z0-9])$", name, re.IGNORECASE) is not None
+    return PYPI_NAME_REGEX.fullmatch(name) is not None
@@ -2,17 +2,91 @@
 
 from __future__ import annotations
 
+import functools
+import os
 import pathlib
 import re
 import subprocess
+from typing import TYPE_CHECKING
 
+from spack import spec
+from spack.util import path as spack_path, spack_yaml
 
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
+# Spack config files listing the repositories, in order of precedence (user, site,
+# system, defaults scope)
+SPACK_REPO_CONFIG_FILES = (
+    "~/.spack/repos.yaml",
+    "$spack/etc/spack/repos.yaml",
+    "/etc/spack/repos.yaml",
+    "$spack/etc/spack/defaults/repos.yaml",
+)
+
+# environment variables that add or move Spack config scopes, the repos.yaml files
+# are not read directly if any of them is set
+SPACK_SCOPE_VARIABLES = (
+    "SPACK_ENV",
+    "SPACK_USER_CONFIG_PATH",
+    "SPACK_SYSTEM_CONFIG_PATH",
+    "SPACK_DISABLE_LOCAL_CONFIG",
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _cached_spec(spec_string: str) -> spec.Spec:
+    return spec.Spec(spec_string)
+
+
+def make_spec(spec_string: str) -> spec.Spec:
+    """Create a Spack Spec from a string.
+
+    Parsing Specs is expensive, and the same few strings are needed over and over
+    (e.g. common CMake dependencies, variants for extras, '^python'), so parsed
+    Specs are cached. Since Specs are mutable, a copy of the cached Spec is returned.
+    """
+    return _cached_spec(spec_string).copy()
+
+
+@functools.cache
+def _packages_in_spack_repos() -> frozenset[str] | None:
+    """Names of all packages in the repositories listed in the Spack config files.
+
+    Each `packages` directory is listed with a single scandir call. Returns None
+    if the repositories can't be determined completely from the config files, or
+    if they don't include Spack's builtin repository.
+    """
+    repos = read_repos_from_config()
+    if repos is None or "builtin" not in repos:
+        return None
+
+    packages: set[str] = set()
+    for repo in repos.values():
+        try:
+            with os.scandir(pathlib.Path(repo) / "packages") as entries:
+                packages.update(e.name for e in entries if e.is_dir())
+        except OSError:
+            return None
+    return frozenset(packages)
+
+
+@functools.cache
 def package_exists_in_spack(name: str) -> bool:
     """Checks if a specific package exists in any local Spack repository.
 
-    The function relies on the `spack list` cli command, thus all repositories
-    known to Spack will be considered (but only those).
+    The packages of the repositories in the Spack config files are listed once,
+    the `spack list` cli command is only used if the repositories can't be
+    determined completely that way. In both cases, all repositories known to
+    Spack will be considered (but only those). Results are cached, so packages
+    added to a repository afterwards are not detected.
     """
+    known_packages = _packages_in_spack_repos()
+    if known_packages is not None:
+        return name in known_packages
+
     result = run_spack_command(f"spack list {name}")
     if result is not None:
         # regex match to make sure the name does not just occur as a substring of
@@ -47,13 +121,99 @@ def run_spack_command(command: str) -> None | str:
     return subprocess.run(command, capture_output=True, text=True, shell=True, check=False).stdout
 
 
-def get_spack_repo(spack_repository: str | None) -> pathlib.Path:
-    """Get a valid Spack repository for the user.
+def _load_yaml(file: pathlib.Path) -> dict | None:
+    """Load a Spack yaml file, returns None if it can't be read or is invalid."""
+    try:
+        with file.open() as f:
+            data = spack_yaml.load(f)
+    except (OSError, spack_yaml.SpackYAMLError):
+        return None
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
 
-    If no repository is provided or it is invalid, prompt the user to choose from the
-    existing repositories.
+
+def _get_repo_paths(config: dict) -> tuple[list[str] | None, bool]:
+    """Get the repository paths of a repos.yaml config, and whether it overrides.
+
+    Spack's yaml loader represents 'repos::' (override lower scopes) as a 'repos'
+    key marked as override, older versions as a literal 'repos:' key. Newer Spack
+    versions map names to repos instead of listing them. The paths are None if
+    the config contains git-based repositories, which are not supported.
+    """
+    repos: object = []
+    override = False
+    for key, value in config.items():
+        if key in {"repos", "repos:"}:
+            repos = value
+            override = key == "repos:" or bool(getattr(key, "override", False))
+
+    entries = list(repos.values()) if isinstance(repos, dict) else repos
+    if not isinstance(entries, list) or not all(isinstance(e, str) for e in entries):
+        return None, override
+    return entries, override
+
+
+def _get_repo_namespace(repo: pathlib.Path) -> str | None:
+    """Get the namespace of a Spack repo from its repo.yaml."""
+    repo_config = _load_yaml(repo / "repo.yaml")
+    if repo_config is None:
+        return None
+    repo_section = repo_config.get("repo")
+    if isinstance(repo_section, dict) and "namespace" in repo_section:
+        return str(repo_section["namespace"])
+    return None
+
+
+def read_repos_from_config(config_files: Iterable[str] | None = None) -> dict[str, str] | None:
+    """Read the local Spack repositories from the repos.yaml config files.
+
+    This avoids starting Spack in a subprocess. By default, the config files of the
+    user, site, system and defaults scope are read.
+
+    Returns:
+        A dict mapping the namespace of each repository to its path, or None if
+        the configuration could not be interpreted completely (e.g. because of
+        other config scopes, git-based repositories or invalid files). In that
+        case, the repositories have to be queried from Spack itself.
     """
-    # load available Spack repositories
+    if config_files is None:
+        if any(variable in os.environ for variable in SPACK_SCOPE_VARIABLES):
+            return None
+        config_files = SPACK_REPO_CONFIG_FILES
+
+    repo_dict: dict[str, str] = {}
+    for config_file in config_files:
+        config_path = pathlib.Path(spack_path.canonicalize_path(config_file))
+        # platform specific scopes are stored in subdirectories and not supported
+        if any(config_path.parent.glob(f"*/{config_path.name}")):
+            return None
+        if not config_path.is_file():
+            continue
+
+        config = _load_yaml(config_path)
+        if config is None:
+            return None
+
+        repo_paths, override = _get_repo_paths(config)
+        if repo_paths is None:
+            return None
+
+        for repo_path in repo_paths:
+            repo = pathlib.Path(spack_path.canonicalize_path(repo_path))
+            namespace = _get_repo_namespace(repo)
+            if namespace is None:
+                return None
+            repo_dict.setdefault(namespace, str(repo))
+
+        if override:
+            break
+
+    return repo_dict or None
+
+
+def _read_repos_from_spack() -> dict[str, str]:
+    """Get the local Spack repositories from the output of `spack repo list`."""
     repo_dict = {}
     result = run_spack_command("spack repo list")
     if result:
@@ -71,6 +231,26 @@ def get_spack_repo(spack_repository: str | None) -> pathlib.Path:
 
             repo_dict[name] = path
 
+    return repo_dict
+
+
+def get_spack_repo(spack_repository: str | None) -> pathlib.Path:
+    """Get a valid Spack repository for the user.
+
+    If no repository is provided or it is invalid, prompt the user to choose from the
+    existing repositories.
+    """
+    # load available Spack repositories, only run Spack if they cannot be read from
+    # its config files directly, or if the provided repository is neither a path nor
+    # found in the config files (Spack is the reference in case they disagree)
+    repo_dict = read_repos_from_config()
+    if repo_dict is None or (
+        spack_repository is not None
+        and spack_repository not in repo_dict
+        and not is_spack_repo(pathlib.Path(spack_repository))
+    ):
+        repo_dict = _read_repos_from_spack()
+
     repo_path = None
     # check if a repository was provided manually
     if spack_repository is not None:
@@ -88,9 +268,11 @@ def get_spack_repo(spack_repository: str | None) -> pathlib.Path:
         elif repo_path is None:
             print("No repository provided.\n")
         # display available repositories
-        if result:
+        if repo_dict:
             print("Repositories found by Spack:")
-            print(result)
+            for name, path in repo_dict.items():
+                print(f"{name:<20} {path}")
+            print()
         else:
             print("No local repositories found by Spack.")
 
@@ -4,15 +4,144 @@ from __future__ import annotations
 
 import functools
 import io
+import json
+import logging
+import os
 import pathlib
 import tarfile
+import tempfile
+import threading
+import time
+from typing import Any
 
 import requests
+from requests import adapters
+from urllib3.util import retry
 
 
+logger = logging.getLogger(__name__)
+
 HTTP_STATUS_SUCCESS = 200
+HTTP_STATUS_NOT_MODIFIED = 304
 HTTP_STATUS_NOT_FOUND = 404
 
+# entries of the persistent cache younger than this are used without revalidation
+CACHE_MAX_AGE_SECONDS = 3600
+
+# size of the HTTP connection pool per host, and number of retries for failed requests
+HTTP_POOL_SIZE = 16
+HTTP_MAX_RETRIES = 3
+
+
+def get_cache_dir() -> pathlib.Path:
+    """Get the directory for the persistent py2spack caches.
+
+    Respects the XDG_CACHE_HOME environment variable, by default the caches are
+    stored in ~/.cache/py2spack. The directory is not created here.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    base = pathlib.Path(cache_home) if cache_home else pathlib.Path.home() / ".cache"
+    return base / "py2spack"
+
+
+def is_cache_file_fresh(path: pathlib.Path, max_age: float = CACHE_MAX_AGE_SECONDS) -> bool:
+    """Check whether the cache file at `path` was written less than `max_age` s ago."""
+    try:
+        return time.time() - path.stat().st_mtime < max_age
+    except OSError:
+        return False
+
+
+def load_json_cache(path: pathlib.Path) -> Any | None:
+    """Load a JSON cache entry, returns None if it does not exist or is invalid."""
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_json_cache(path: pathlib.Path, data: Any) -> None:
+    """Store a JSON cache entry.
+
+    The file is written atomically, such that concurrent readers never see partial
+    entries. Errors are ignored, as the cache is only an optimization.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent, delete=False, suffix=".tmp"
+        ) as f:
+            json.dump(data, f)
+        pathlib.Path(f.name).replace(path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+class LimitedSession(requests.Session):
+    """HTTP session which limits the number of concurrent requests over all threads.
+
+    All requests can also be cancelled, such that running conversions stop as early
+    as possible, e.g. after the user aborted.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the session with the default limit of HTTP_POOL_SIZE requests."""
+        super().__init__()
+        self.request_slots = threading.BoundedSemaphore(HTTP_POOL_SIZE)
+        self.cancelled = threading.Event()
+
+    def request(self, *args: Any, **kwargs: Any) -> requests.Response:
+        """Send a request once a slot is free, raises if requests were cancelled."""
+        with self.request_slots:
+            if self.cancelled.is_set():
+                msg = "Request cancelled"
+                raise requests.exceptions.RequestException(msg)
+            return super().request(*args, **kwargs)
+
+
+@functools.cache
+def get_session() -> LimitedSession:
+    """Get the HTTP session shared by all requests.
+
+    Reusing one session keeps connections to the same host (PyPI, GitHub) alive
+    instead of doing a new TCP/TLS handshake for every request. Transient errors
+    are retried with exponential backoff. Threads wait for a free connection
+    instead of opening (and discarding) additional ones.
+    """
+    session = LimitedSession()
+    adapter = adapters.HTTPAdapter(
+        pool_connections=HTTP_POOL_SIZE,
+        pool_maxsize=HTTP_POOL_SIZE,
+        pool_block=True,
+        max_retries=retry.Retry(
+            total=HTTP_MAX_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=(500, 502, 503, 504),
+            # return the last response instead of raising, the callers handle errors
+            # based on the status code
+            raise_on_status=False,
+        ),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def limit_concurrent_requests(max_requests: int) -> None:
+    """Set the maximum number of concurrent requests of the shared session."""
+    get_session().request_slots = threading.BoundedSemaphore(max_requests)
+
+
+def cancel_requests() -> None:
+    """Make all further requests of the shared session fail immediately."""
+    get_session().cancelled.set()
+
+
+def resume_requests() -> None:
+    """Allow requests of the shared session again after `cancel_requests`."""
+    get_session().cancelled.clear()
+
 
 @functools.lru_cache
 def download_bytes(url: str) -> bytes | None:
@@ -20,7 +149,7 @@ def download_bytes(url: str) -> bytes | None:
 
     Responses are cached (cache size of 128).
     """
-    response = requests.get(url)
+    response = get_session().get(url)
     if response.status_code == HTTP_STATUS_SUCCESS and isinstance(response.content, bytes):
         return response.content
 
@@ -42,24 +171,25 @@ def extract_file_content_from_tar_bytes(
     tar_bytes_object = io.BytesIO(tar_bytes)
     try:
         with tarfile.open(fileobj=tar_bytes_object, mode="r:*") as tar:
-            names = tar.getnames()
+            # read the member headers once and index them by name, instead of
+            # repeatedly scanning the list of members
+            members = {member.name: member for member in tar}
 
             # expect the file path to start either at the archive root directory,
             # or in the single top-level directory after the root
-            top_level_files = list({x.split("/")[0] for x in names})
-            if file_path not in names and len(top_level_files) == 1:
-                file_path = f"{top_level_files[0]}/{file_path}"
-                if file_path not in names:
+            top_level_files = {x.split("/")[0] for x in members}
+            if file_path not in members and len(top_level_files) == 1:
+                file_path = f"{next(iter(top_level_files))}/{file_path}"
+                if file_path not in members:
                     return None
 
-            member = tar.getmember(file_path)
-            f = tar.extractfile(member)
+            f = tar.extractfile(members[file_path])
 
             if f is not None:
                 return f.read().decode("utf-8")
 
     except (OSError, tarfile.TarError, UnicodeDecodeError, KeyError) as e:
-        print(f"Error when extracting file {file_path} from tar: {e}")
+        logger.warning("Error when extracting file %s from tar: %s", file_path, e)
 
     return None
 
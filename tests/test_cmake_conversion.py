@@ -308,6 +308,39 @@ def test_convert_add_subdirectory(add_subdirectory: ast.Command, expected: str |
     assert cmake_conversion._convert_add_subdirectory(add_subdirectory) == expected
 
 
+@pytest.mark.parametrize(
+    ("data", "expected"),
+    [
+        (
+            'project(x)\nfind_package(A 1.2)\nset(Y "(")\nadd_subdirectory(sub)\n',
+            "\nfind_package(A 1.2)\n\nadd_subdirectory(sub)\n",
+        ),
+        (
+            "if(X)\n  find_package(B\n    REQUIRED) # find_package(C)\nendif()",
+            "\nfind_package(B\n    REQUIRED)\n",
+        ),
+        ('message("x")\nfind_package(\\( "a)b")', '\nfind_package(\\( "a)b")'),
+        # commands in quoted arguments or comments are ignored
+        (
+            'file(WRITE x.cmake "\nfind_package(Foo 1.2)\n")\nfind_package(A)',
+            "\n\n\nfind_package(A)",
+        ),
+        ("foo() # see bar() find_package(Baz)\nfind_package(A)", "\nfind_package(A)"),
+        ('set(X \\"a)\nfind_package(A)', "\nfind_package(A)"),
+        # commands in the arguments of other commands are ignored
+        ("set(X\n  find_package(A))\nfind_package(B)", "\n\nfind_package(B)"),
+        ("list(APPEND L\n  add_subdirectory(foo))", "\n"),
+        ("foo(a (b)\nfind_package(A))find_package(B)", "\nfind_package(B)"),
+        # unbalanced or bracket arguments: unchanged
+        ("find_package(A\n", "find_package(A\n"),
+        ("set(X\nfind_package(A)", "set(X\nfind_package(A)"),
+        ("#[[\nfind_package(A)\n]]", "#[[\nfind_package(A)\n]]"),
+    ],
+)
+def test_extract_relevant_commands(data: str, expected: str):
+    assert cmake_conversion._extract_relevant_commands(data) == expected
+
+
 def test_convert_cmake_dependencies():
     with pathlib.Path("tests/sample_data/CMakeLists.txt").open() as f:
         data = f.read()
@@ -346,3 +379,46 @@ def test_convert_cmake_dependencies():
 
     assert set(subdirectories) == expected_subdirectories
     assert set(dependencies) == expected_dependencies
+
+
+def test_convert_cmake_dependencies_repeated():
+    data = "find_package(Boost 1.70)\nfind_package(Boost 1.70)\n"
+
+    dependencies, _ = cmake_conversion.convert_cmake_dependencies(data)
+
+    assert [line for _, line in dependencies] == [1, 2]
+    first, second = (dep for dep, _ in dependencies)
+    assert first == second
+    # the Specs are mutable, modifying one must not affect the other
+    assert first is not second
+
+
+def test_convert_cmake_tree():
+    files = {
+        pathlib.Path("CMakeLists.txt"): (
+            "cmake_minimum_required(VERSION 3.19)\n"
+            "add_subdirectory(ext)\n"
+            "add_subdirectory(missing)\n"
+        ),
+        pathlib.Path("ext/CMakeLists.txt"): "add_subdirectory(..)\nfind_package(Boost 1.70)\n",
+    }
+
+    dependencies = cmake_conversion.convert_cmake_tree(files.get)
+
+    assert dependencies == [
+        (spec.Spec("cmake@3.19:"), pathlib.Path("CMakeLists.txt"), 1),
+        (spec.Spec("boost@1.70"), pathlib.Path("ext/CMakeLists.txt"), 2),
+    ]
+
+
+def test_parse_relevant_commands_cache(cache_dir: pathlib.Path):
+    data = "project(x)\nfind_package(Boost 1.70)\n"
+    cache_file = cmake_conversion._command_cache_file(data)
+    assert cache_file.parent == cache_dir / "cmake"
+    assert cache_file.name.endswith(f"-{cmake_conversion.COMMAND_CACHE_FORMAT}.json")
+
+    # bypass the in-memory cache
+    commands = cmake_conversion._parse_relevant_commands.__wrapped__(data)
+    assert cache_file.is_file()
+    assert cmake_conversion._load_cached_commands(cache_file) == commands
+    assert [(c.identifier, c.line) for c in commands] == [("find_package", 2)]
@@ -345,6 +345,29 @@ def test_evaluate_marker(
     assert result == expected
 
 
+@pytest.mark.parametrize(
+    ("marker", "normal_order"),
+    [
+        ("'linux' == sys_platform", "sys_platform == 'linux'"),
+        ("'linux' != sys_platform", "sys_platform != 'linux'"),
+        ("'3.8' <= python_version", "python_version >= '3.8'"),
+        ("'3.8' > python_version", "python_version < '3.8'"),
+        ("'cpython' == implementation_name", "implementation_name == 'cpython'"),
+    ],
+)
+def test_evaluate_marker_flipped(marker: str, normal_order: str) -> None:
+    """Markers with the literal on the left are evaluated like the normal order."""
+    provider = package_providers.PyPIProvider()
+    result = conversion_tools.evaluate_marker(markers.Marker(marker), provider)
+    expected = conversion_tools.evaluate_marker(markers.Marker(normal_order), provider)
+
+    if isinstance(expected, list):
+        assert isinstance(result, list)
+        assert {str(s) for s in result} == {str(s) for s in expected}
+    else:
+        assert result == expected
+
+
 @pytest.mark.parametrize(
     ("req", "from_extra", "expected"),
     [
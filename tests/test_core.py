@@ -2,12 +2,14 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import pathlib
 
 import pytest
+import requests
 from spack import spec
 
-from py2spack import core, package_providers
+from py2spack import core, package_providers, spack_utils
 
 
 def test_load_pyprojects():
@@ -294,3 +296,77 @@ def test_convert_package_writes_file(package: str) -> None:
 
         assert not file.is_file()
         assert not pkg_dir.is_dir()
+
+
+def _fake_spackpkg(name: str, dependencies: set[str]) -> core.SpackPyPkg:
+    pkg = core.SpackPyPkg()
+    pkg.name = f"py-{name}"
+    pkg.original_dependencies = dependencies
+    pkg.num_converted_versions = 1
+    return pkg
+
+
+def test_conversion_state_add_result(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(spack_utils, "package_exists_in_spack", lambda name: name == "py-known")
+    (tmp_path / "packages").mkdir()
+    state = core._ConversionState(ignored={"ignored"}, enqueued={"pkg"})
+
+    future: concurrent.futures.Future[core.SpackPyPkg | None] = concurrent.futures.Future()
+    future.set_result(_fake_spackpkg("pkg", {"python", "known", "ignored", "pkg", "new"}))
+    state.add_result("pkg", future, tmp_path)
+
+    assert (tmp_path / "packages" / "py-pkg" / "package.py").is_file()
+    assert state.written == {"py-pkg"}
+    assert state.converted == [("pkg", 1, False)]
+    assert list(state.queue) == ["new"]
+    assert not state.conversion_failures
+
+
+def test_conversion_state_add_result_error(tmp_path: pathlib.Path) -> None:
+    state = core._ConversionState(ignored=set())
+
+    future: concurrent.futures.Future[core.SpackPyPkg | None] = concurrent.futures.Future()
+    future.set_exception(requests.exceptions.RequestException("Request cancelled"))
+    state.add_result("pkg", future, tmp_path)
+
+    assert state.conversion_failures == ["pkg"]
+    assert not state.converted
+    assert not state.queue
+
+
+@pytest.mark.parametrize(
+    ("max_conversions", "expected_written"),
+    [
+        (-1, {"py-root", "py-a", "py-b", "py-c"}),
+        (2, {"py-root", "py-a"}),
+    ],
+)
+def test_convert_package_queue(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    max_conversions: int,
+    expected_written: set[str],
+) -> None:
+    """The conversion queue with a fake conversion of single packages."""
+    dependencies = {"root": {"a"}, "a": {"b", "c"}, "b": {"broken"}, "c": set()}
+
+    def fake_convert_single(name: str, *_args: object, **_kwargs: object) -> core.SpackPyPkg | None:
+        if name not in dependencies:
+            msg = "Conversion failed"
+            raise requests.exceptions.RequestException(msg)
+        return _fake_spackpkg(name, dependencies[name])
+
+    monkeypatch.setattr(core, "_convert_single", fake_convert_single)
+    monkeypatch.setattr(spack_utils, "get_spack_repo", lambda _repo: tmp_path)
+    monkeypatch.setattr(spack_utils, "package_exists_in_spack", lambda _name: False)
+    monkeypatch.setattr(
+        package_providers.GitHubProvider, "package_exists", lambda _self, _name: False
+    )
+    (tmp_path / "packages").mkdir()
+
+    core.convert_package("root", max_conversions=max_conversions, jobs=2)
+
+    written = {p.name for p in (tmp_path / "packages").iterdir()}
+    assert written == expected_written
@@ -2,10 +2,14 @@
 
 from __future__ import annotations
 
+import dataclasses
+import os
+import pathlib
+
 import pytest
 from packaging import version as pv
 
-from py2spack import package_providers
+from py2spack import package_providers, utils
 
 
 @pytest.mark.parametrize(
@@ -51,6 +55,83 @@ def test_parse_archive_extension_invalid(filename: str) -> None:
     )
 
 
+@dataclasses.dataclass
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    status_code: int
+    data: dict | None = None
+    headers: dict = dataclasses.field(default_factory=dict)
+    text: str = ""
+
+    def json(self) -> dict | None:
+        """Get the JSON data of the response."""
+        return self.data
+
+
+@dataclasses.dataclass
+class FakeSession:
+    """Returns the given responses in order, and records the request headers."""
+
+    responses: list[FakeResponse]
+    requests: list[dict] = dataclasses.field(default_factory=list)
+
+    def get(self, _url: str, headers: dict, timeout: float) -> FakeResponse:  # noqa: ARG002
+        """Return the next response."""
+        self.requests.append(headers)
+        return self.responses.pop(0)
+
+
+def test_pypiprovider_get_cache(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path) -> None:
+    """The JSON API responses are cached on disk and revalidated through their ETag."""
+    data = {"files": [], "versions": ["1.0"]}
+    session = FakeSession(
+        [FakeResponse(200, data, {"ETag": '"abc"'}), FakeResponse(304), FakeResponse(200, {})]
+    )
+    monkeypatch.setattr(utils, "get_session", lambda: session)
+    provider = package_providers.PyPIProvider(cache_dir=tmp_path)
+    # bypass the in-memory cache
+    get = package_providers.PyPIProvider._get.__wrapped__
+
+    # response is saved
+    assert get(provider, "Some_Package") == data
+    cache_files = list(tmp_path.glob("*/some-package.json"))
+    assert len(cache_files) == 1
+    assert session.requests[-1].get("If-None-Match") is None
+
+    # fresh entry is used without request
+    assert get(provider, "some-package") == data
+    assert len(session.requests) == 1
+
+    # stale entry is revalidated
+    os.utime(cache_files[0], (0, 0))
+    assert get(provider, "some-package") == data
+    assert session.requests[-1]["If-None-Match"] == '"abc"'
+    assert utils.is_cache_file_fresh(cache_files[0])
+
+    # other indexes don't share the cache
+    mirror = package_providers.PyPIProvider(
+        base_url="https://test.pypi.org/simple/", cache_dir=tmp_path
+    )
+    assert get(mirror, "some-package") == {}
+    assert not session.responses
+
+
+def test_pypiprovider_sdist_cache_file(tmp_path: pathlib.Path) -> None:
+    """Each file of an sdist has its own cache entry."""
+    provider = package_providers.PyPIProvider(cache_dir=tmp_path)
+    metadata: dict[str, str | dict] = {"hashes": {"sha256": "abc"}}
+
+    pyproject = provider._sdist_cache_file(metadata, pathlib.Path("pyproject.toml"))
+    cmakelists = provider._sdist_cache_file(metadata, pathlib.Path("CMakeLists.txt"))
+    assert pyproject is not None
+    assert cmakelists is not None
+    assert pyproject != cmakelists
+    assert pyproject.parent == cmakelists.parent == tmp_path / "sdist" / "abc"
+
+    assert provider._sdist_cache_file({"hashes": {}}, pathlib.Path("pyproject.toml")) is None
+
+
 @pytest.mark.parametrize(
     ("dirname", "pkg_name", "expected"),
     [
@@ -155,3 +236,21 @@ def test_pypilookup_get_files():
 # _acceptable_version -> same as in conversion tools
 # PyPILookup functions: _get, get_versions, get_files
 # try_load_pyproject
+
+
+def test_pypiprovider_prefetch_versions_normalized(monkeypatch: pytest.MonkeyPatch) -> None:
+    requested: list[str] = []
+
+    def fake_get(_self: package_providers.PyPIProvider, name: str) -> dict:
+        requested.append(name)
+        return {"versions": ["1.0", "2.0"]}
+
+    monkeypatch.setattr(package_providers.PyPIProvider, "_get", fake_get)
+    provider = package_providers.PyPIProvider(cache_dir=None)
+
+    provider.prefetch_versions(["Foo_Bar", "foo-bar", "foo.bar"])
+    assert requested == ["foo-bar"]
+
+    # served from the cache, for any spelling
+    assert provider.get_versions("FOO_BAR") == [pv.Version("1.0"), pv.Version("2.0")]
+    assert requested == ["foo-bar"]
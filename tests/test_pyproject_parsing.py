@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import pytest
 from packaging import specifiers
 
 from py2spack import pyproject_parsing
@@ -152,3 +153,22 @@ def test_get_homepage() -> None:
     # Simulate a scenario where homepage is missing
     no_homepage_fetcher = pyproject_parsing.DataFetcher({"project": {"urls": {}}})
     assert no_homepage_fetcher.get_homepage() is None
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("black", True),
+        ("Py2Spack", True),
+        ("zope.interface", True),
+        ("a", True),
+        ("my_pkg-1", True),
+        ("-pkg", False),
+        ("pkg.", False),
+        ("pkg name", False),
+        ("pkg\n", False),
+        ("", False),
+    ],
+)
+def test_valid_pypi_name(name: str, expected: bool):
+    assert pyproject_parsing.valid_pypi_name(name) == expected
@@ -3,6 +3,8 @@ from __future__ import annotations
 import os
 import pathlib
 
+import pytest
+
 from py2spack import spack_utils
 
 
@@ -20,6 +22,82 @@ def test_get_spack_repo2():
             assert spack_utils.get_spack_repo("builtin") == builtin_repo
 
 
+def test_read_repos_from_config(tmp_path: pathlib.Path):
+    repo = pathlib.Path.cwd() / "tests" / "sample_data" / "sample_repo"
+    user_config = tmp_path / "user" / "repos.yaml"
+    user_config.parent.mkdir()
+    user_config.write_text(f"repos:\n- {repo}\n")
+    defaults_config = tmp_path / "defaults" / "repos.yaml"
+    defaults_config.parent.mkdir()
+    defaults_config.write_text(f"repos:\n  sample: {repo}\n")
+
+    config_files = [str(user_config), str(defaults_config)]
+    assert spack_utils.read_repos_from_config(config_files) == {"sample_repo": str(repo)}
+    assert spack_utils.read_repos_from_config([str(tmp_path / "missing.yaml")]) is None
+    # missing config files are skipped
+    config_files = [str(tmp_path / "missing.yaml"), str(user_config)]
+    assert spack_utils.read_repos_from_config(config_files) == {"sample_repo": str(repo)}
+
+
+def test_read_repos_from_config_unknown_namespace(tmp_path: pathlib.Path):
+    repo = tmp_path / "repo"
+    (repo / "packages").mkdir(parents=True)
+    (repo / "repo.yaml").write_text("repo:\n  api: v2.0\n")
+    config = tmp_path / "user" / "repos.yaml"
+    config.parent.mkdir()
+    config.write_text(f"repos:\n- {repo}\n")
+
+    assert spack_utils.read_repos_from_config([str(config)]) is None
+
+
+def test_get_spack_repo_falls_back_to_spack(monkeypatch: pytest.MonkeyPatch):
+    config_repo = pathlib.Path.cwd() / "tests" / "sample_data" / "sample_repo"
+    monkeypatch.setattr(
+        spack_utils, "read_repos_from_config", lambda: {"sample_repo": str(config_repo)}
+    )
+    spack_queries = []
+
+    def read_repos_from_spack() -> dict[str, str]:
+        spack_queries.append(True)
+        return {"other": str(config_repo)}
+
+    monkeypatch.setattr(spack_utils, "_read_repos_from_spack", read_repos_from_spack)
+
+    # found in the config files, or given as path: Spack is not queried
+    assert spack_utils.get_spack_repo("sample_repo") == config_repo
+    assert spack_utils.get_spack_repo(str(config_repo)) == config_repo
+    assert not spack_queries
+    # unknown to the config files, e.g. configured in another scope
+    assert spack_utils.get_spack_repo("other") == config_repo
+    assert len(spack_queries) == 1
+
+
+@pytest.mark.parametrize(
+    "defaults",
+    [
+        # repository does not exist
+        "repos:\n- {missing}\n",
+        # git-based repositories are not supported
+        "repos:\n  builtin:\n    git: https://github.com/spack/spack-packages.git\n",
+    ],
+)
+def test_read_repos_from_config_override(tmp_path: pathlib.Path, defaults: str):
+    repo = pathlib.Path.cwd() / "tests" / "sample_data" / "sample_repo"
+    user_config = tmp_path / "user" / "repos.yaml"
+    user_config.parent.mkdir()
+    user_config.write_text(f"repos::\n- {repo}\n")
+    defaults_config = tmp_path / "defaults" / "repos.yaml"
+    defaults_config.parent.mkdir()
+    defaults_config.write_text(defaults.format(missing=tmp_path / "missing"))
+
+    # the lower precedence scope is ignored because of the override
+    result = spack_utils.read_repos_from_config([str(user_config), str(defaults_config)])
+    assert result == {"sample_repo": str(repo)}
+    # without the override, the lower precedence scope can't be interpreted
+    user_config.write_text(f"repos:\n- {repo}\n")
+    assert spack_utils.read_repos_from_config([str(user_config), str(defaults_config)]) is None
+
+
 def test_package_exists_in_spack():
     assert spack_utils.package_exists_in_spack("py-hatchling")
     assert spack_utils.package_exists_in_spack("automake")
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import pathlib
+from typing import TYPE_CHECKING
 
 from packaging import requirements, version as pv
 from spack import spec
@@ -10,6 +11,10 @@ from spack import spec
 from py2spack import core, package_providers
 
 
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+
 def test_spackpypkg_metadata_from_pyproject():
     """Not tested.
 
@@ -65,6 +70,9 @@ class MockPackageProvider:
 
         return package_providers.PackageProviderQueryError(f"No versions found for package {name}")
 
+    def prefetch_versions(self, names: Iterable[str]) -> None:
+        """."""
+
 
 def test_spackpypkg_requirement_from_pyproject1():
     spackpkg = core.SpackPyPkg()
@@ -5,6 +5,7 @@ from __future__ import annotations
 import pathlib
 
 import pytest
+import requests
 
 from py2spack import utils
 
@@ -78,3 +79,31 @@ def test_extract_file_contents_from_tar_bytes_invalid() -> None:
 )
 def test_normalize_path(path: pathlib.Path, expected: pathlib.Path):
     assert utils.normalize_path(path) == expected
+
+
+def test_json_cache_roundtrip(tmp_path: pathlib.Path):
+    cache_file = tmp_path / "subdir" / "entry.json"
+    assert utils.load_json_cache(cache_file) is None
+    assert not utils.is_cache_file_fresh(cache_file)
+
+    utils.save_json_cache(cache_file, {"etag": "abc", "data": {"versions": ["1.0"]}})
+
+    assert utils.load_json_cache(cache_file) == {"etag": "abc", "data": {"versions": ["1.0"]}}
+    assert utils.is_cache_file_fresh(cache_file)
+    assert not utils.is_cache_file_fresh(cache_file, max_age=0)
+
+
+def test_session_returns_failed_responses() -> None:
+    # failed responses are handled by the callers based on the status code
+    retries = utils.get_session().get_adapter("https://pypi.org").max_retries
+    assert retries.total == utils.HTTP_MAX_RETRIES
+    assert not retries.raise_on_status
+
+
+def test_cancel_requests() -> None:
+    utils.cancel_requests()
+    with pytest.raises(requests.exceptions.RequestException):
+        utils.get_session().get("https://pypi.org/pypi/requests/json")
+
+    utils.resume_requests()
+    assert not utils.get_session().cancelled.is_set()